@@ -24,6 +24,46 @@ def create_app():
     app.config['SCORM_FOLDER'] = os.path.join(directory_path,'static/scorm_packages')
     app.config['MAX_CONTENT_LENGTH'] = 200 * 1024 * 1024
 
+    # SCORM runtime: the player buffers LMSSetValue calls and flushes them on
+    # LMSCommit/LMSFinish, or once either threshold below is reached
+    app.config['SCORM_BUFFER_MAX_ITEMS'] = int(os.getenv('SCORM_BUFFER_MAX_ITEMS', 50))
+    app.config['SCORM_BUFFER_MAX_SECONDS'] = int(os.getenv('SCORM_BUFFER_MAX_SECONDS', 30))
+    # CMI storage layout: 'rows' (scorm_data, one row per key) or 'document'
+    # (scorm_documents, one JSONB document per learner and course)
+    app.config['SCORM_STORAGE'] = os.getenv('SCORM_STORAGE', 'rows')
+    # Attempt registry: 'memory' (per-worker LRU) or 'database' (scorm_attempts
+    # table shared by all workers); idle attempts expire after SCORM_ATTEMPT_TTL seconds
+    app.config['SCORM_ATTEMPT_REGISTRY'] = os.getenv('SCORM_ATTEMPT_REGISTRY', 'memory')
+    app.config['SCORM_ATTEMPT_TTL'] = int(os.getenv('SCORM_ATTEMPT_TTL', 4 * 60 * 60))
+    app.config['SCORM_ATTEMPT_CACHE_SIZE'] = int(os.getenv('SCORM_ATTEMPT_CACHE_SIZE', 10000))
+    # Courses with prefetch_resume embed the CMI snapshot in the player page
+    # when its JSON is at most this many bytes; larger ones use initialize
+    app.config['SCORM_PREFETCH_MAX_BYTES'] = int(os.getenv('SCORM_PREFETCH_MAX_BYTES', 64 * 1024))
+    # Certificates are issued in the background from queued completion events
+    app.config['COMPLETION_BATCH_INTERVAL'] = float(os.getenv('COMPLETION_BATCH_INTERVAL', 5))
+    app.config['COMPLETION_BATCH_SIZE'] = int(os.getenv('COMPLETION_BATCH_SIZE', 500))
+    # LRS: activity ids and agent mboxes already stored are remembered per worker
+    app.config['LRS_KNOWN_CACHE_SIZE'] = int(os.getenv('LRS_KNOWN_CACHE_SIZE', 10000))
+    # LRS ingestion: 'sync' (stored before responding) or 'spool' (acknowledged once
+    # fsynced to a local spool file, stored in bulk by a background writer)
+    app.config['LRS_INGEST_MODE'] = os.getenv('LRS_INGEST_MODE', 'sync')
+    app.config['LRS_SPOOL_DIR'] = os.getenv('LRS_SPOOL_DIR', os.path.join(app.instance_path, 'lrs_spool'))
+    app.config['LRS_SPOOL_MAX_BYTES'] = int(os.getenv('LRS_SPOOL_MAX_BYTES', 256 * 1024 * 1024))
+    app.config['LRS_SPOOL_BATCH_SIZE'] = int(os.getenv('LRS_SPOOL_BATCH_SIZE', 1000))
+    app.config['LRS_SPOOL_INTERVAL'] = float(os.getenv('LRS_SPOOL_INTERVAL', 0.5))
+    app.config['LRS_SPOOL_RETRY_AFTER'] = int(os.getenv('LRS_SPOOL_RETRY_AFTER', 5))
+    # State API documents of recently active attempts, cached per worker for a few seconds
+    app.config['LRS_STATE_CACHE_SIZE'] = int(os.getenv('LRS_STATE_CACHE_SIZE', 2000))
+    app.config['LRS_STATE_CACHE_TTL'] = float(os.getenv('LRS_STATE_CACHE_TTL', 5))
+    # Activity rollups follow stored statements LRS_ROLLUP_BATCH_SIZE at a time,
+    # every LRS_ROLLUP_INTERVAL seconds
+    app.config['LRS_ROLLUP_INTERVAL'] = float(os.getenv('LRS_ROLLUP_INTERVAL', 10))
+    app.config['LRS_ROLLUP_BATCH_SIZE'] = int(os.getenv('LRS_ROLLUP_BATCH_SIZE', 2000))
+    # Monthly statement partitions (PostgreSQL) created ahead of time; `flask lrs
+    # archive` writes detached partitions to LRS_ARCHIVE_DIR as gzipped NDJSON
+    app.config['LRS_PARTITION_MONTHS_AHEAD'] = int(os.getenv('LRS_PARTITION_MONTHS_AHEAD', 3))
+    app.config['LRS_ARCHIVE_DIR'] = os.getenv('LRS_ARCHIVE_DIR', os.path.join(app.instance_path, 'lrs_archive'))
+
     # Create necessary directories
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(app.config['SCORM_FOLDER'], exist_ok=True)
@@ -67,6 +107,11 @@ def create_app():
     app.register_blueprint(adminBlueprint)
     from app.routes.dashboard import blp as dashboardBlueprint
     app.register_blueprint(dashboardBlueprint)
+
+    # Register CLI commands
+    from app.commands import lrs_cli, scorm_cli
+    app.cli.add_command(scorm_cli)
+    app.cli.add_command(lrs_cli)
     
     @app.context_processor
     def inject_global_template_variables():
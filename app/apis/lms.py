@@ -1,11 +1,18 @@
 from datetime import datetime
+import hashlib
+import hmac
+import threading
+import uuid
 from zoneinfo import ZoneInfo
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, current_app, jsonify, request, session
 from flask_login import current_user
 
+from app.classes.completion_worker import completion_worker
+from app.classes.lru_cache import LRUCache
 from app.db import db
-from app.models import ScormData
-from app.models.user_courses import UserCourse
+from app.models import CompletionEvent, ScormData, ScormDocument
+from app.models.scorm_attempts import ScormAttempt
+from app.models.scorm_data import compression_stats
 
 
 blp = Blueprint('api_lms',__name__, url_prefix='/api/lms')
@@ -13,19 +20,165 @@ blp = Blueprint('api_lms',__name__, url_prefix='/api/lms')
 # SCORM API endpoints - Revised
 from flask import jsonify, request, session
 
+
+class Attempt:
+    """This worker's view of one learner's attempt at a course."""
+
+    def __init__(self, token, dirty=False, last_commit_at=None):
+        self.token = token
+        self.dirty = dirty
+        self.last_commit_at = last_commit_at
+
+
+class AttemptRegistry:
+    """Tracks initialized, unfinished SCORM attempts keyed by (user_id, course_id).
+
+    Attempts always live in an in-process LRU with TTL (SCORM_ATTEMPT_TTL). With
+    SCORM_ATTEMPT_REGISTRY=database they are also recorded in scorm_attempts, so
+    every worker and tab sees the same attempts and LMSInitialize is enforced
+    strictly. In the default memory mode a worker that did not handle the
+    initialize call only adopts an attempt whose token the player sends back:
+    tokens are signed with SECRET_KEY for the learner and course, so any
+    worker can check one without shared state. Without a valid token the
+    learner has not initialized (or has finished) and gets error 132.
+
+    Unchanged values are detected by the database (see _persist_values),
+    never from this worker's memory: another worker may have stored a newer
+    value since. The registry only counts written and elided values.
+    """
+
+    def __init__(self):
+        self._cache = None
+        self._lock = threading.Lock()
+        self.writes_persisted = 0
+        self.writes_elided = 0
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            self._cache = LRUCache(current_app.config['SCORM_ATTEMPT_CACHE_SIZE'], current_app.config['SCORM_ATTEMPT_TTL'])
+        return self._cache
+
+    @property
+    def shared(self):
+        return current_app.config['SCORM_ATTEMPT_REGISTRY'] == 'database'
+
+    @staticmethod
+    def _signature(user_id, course_id, nonce):
+        message = f'{user_id}:{course_id}:{nonce}'.encode()
+        return hmac.new(current_app.config['SECRET_KEY'].encode(), message, hashlib.sha256).hexdigest()[:32]
+
+    def _valid_token(self, user_id, course_id, token):
+        nonce, _, signature = (token or '').partition('.')
+        return bool(nonce and signature) and hmac.compare_digest(signature, self._signature(user_id, course_id, nonce))
+
+    def start(self, user_id, course_id):
+        nonce = uuid.uuid4().hex
+        attempt = Attempt(f'{nonce}.{self._signature(user_id, course_id, nonce)}')
+        if self.shared:
+            ScormAttempt.start(user_id, course_id, attempt.token)
+        self.cache.set((user_id, course_id), attempt)
+        return attempt
+
+    def get(self, user_id, course_id, token=None):
+        """Return the active attempt, or None if the learner has not initialized the course.
+
+        `token` is the attempt token the player received from initialize; in
+        memory mode it lets this worker adopt an attempt started elsewhere.
+        """
+        key = (user_id, course_id)
+        attempt = self.cache.get(key)
+        if attempt is None:
+            if self.shared:
+                row = ScormAttempt.get_active(user_id, course_id, self.cache.ttl)
+                if row is None:
+                    return None
+                attempt = Attempt(row.token, row.dirty, row.last_commit_at)
+            elif self._valid_token(user_id, course_id, token):
+                attempt = Attempt(token)
+            else:
+                return None
+        self.cache.set(key, attempt)  # restarts the TTL
+        return attempt
+
+    def count_writes(self, sent, written):
+        """Record that `written` of `sent` values changed the stored data."""
+        with self._lock:
+            self.writes_persisted += written
+            self.writes_elided += sent - written
+
+    def mark_dirty(self, user_id, course_id, attempt):
+        if not attempt.dirty:
+            attempt.dirty = True
+            if self.shared:
+                ScormAttempt.update_state(user_id, course_id, dirty=True)
+
+    def mark_committed(self, user_id, course_id, attempt):
+        attempt.dirty = False
+        attempt.last_commit_at = datetime.now(tz=ZoneInfo('Asia/Kolkata'))
+        if self.shared:
+            ScormAttempt.update_state(user_id, course_id, dirty=False, last_commit_at=attempt.last_commit_at)
+
+    def finish(self, user_id, course_id):
+        self.cache.pop((user_id, course_id))
+        if self.shared:
+            ScormAttempt.update_state(user_id, course_id, active=False, dirty=False)
+
+    def active_count(self):
+        if self.shared:
+            return ScormAttempt.count_active(self.cache.ttl)
+        return len(self.cache)
+
+
+attempts = AttemptRegistry()
+
+
+def cmi_store():
+    """CMI storage backend for this deployment: ScormData (row per key) or ScormDocument (one document per attempt)."""
+    return ScormDocument if current_app.config['SCORM_STORAGE'] == 'document' else ScormData
+
+def _read_values(data):
+    """Extract the {cmi_key: value} map the player buffered since its last flush."""
+    values = (data or {}).get('values') or {}
+    return {str(key): '' if value is None else str(value) for key, value in values.items() if key}
+
+def _persist_values(user_id, course_id, values):
+    """Write a batch of CMI values and commit; returns how many changed the stored data.
+
+    Every batch costs one upsert and a commit: the player's buffer drops
+    values it already sent, and the upsert's IS DISTINCT FROM guard leaves
+    unchanged rows alone. Certification is queued, in the same transaction,
+    only when this batch is what set lesson_status to passed.
+    """
+    if not values:
+        return 0
+    written = cmi_store().upsert_many(user_id, course_id, values)
+    passed = 'cmi.core.lesson_status' in written and values['cmi.core.lesson_status'] == 'passed'
+    if passed:
+        CompletionEvent.enqueue_scorm(user_id, course_id)
+    db.session.commit()
+    attempts.count_writes(len(values), len(written))
+    if passed:
+        completion_worker.ensure_started(current_app._get_current_object())
+    return len(written)
+
 @blp.route('/scorm/<int:course_id>/initialize', methods=['POST'])
 def scorm_initialize(course_id):
-    """Initialize SCORM session - should return true/false, not suspend_data"""
+    """Initialize SCORM session and return the learner's CMI snapshot for the course"""
     try:
         # Check if user has existing progress
         user_id = current_user.id
         if not user_id:
             return jsonify({'result': 'false', 'errorCode': '101'})  # No current user session
         
-        # Initialize session state
-        session[f'scorm_{course_id}_initialized'] = True
-        
-        return jsonify({'result': 'true', 'errorCode': '0'})
+        # Send the whole CMI data model in one query so the player can answer
+        # LMSGetValue locally instead of one request per element
+        snapshot = cmi_store().get_snapshot(user_id, course_id)
+
+        # Register the attempt server-side (no cookie session state)
+        attempt = attempts.start(user_id, course_id)
+
+        return jsonify({'result': 'true', 'errorCode': '0', 'data': snapshot, 'attempt': attempt.token})
     except Exception as e:
         return jsonify({'result': 'false', 'errorCode': '101'}) 
 
@@ -37,9 +190,9 @@ def scorm_get_value(course_id):
         data = request.get_json()
         cmi_key = data.get('element', '')
         user_id = current_user.id
-        result = ScormData.get_by_key(user_id, course_id, cmi_key)
-        if result: 
-            return jsonify({'result': result.cmi_value, 'errorCode': '0'})
+        result = cmi_store().get_value(user_id, course_id, cmi_key)
+        if result is not None:
+            return jsonify({'result': result, 'errorCode': '0'})
         else:
             return jsonify({'result': '', 'errorCode': '101'})
 
@@ -55,33 +208,17 @@ def scorm_set_value(course_id):
         cmi_value = data.get('value', '')
         user_id = current_user.id
         
-        if not session.get(f'scorm_{course_id}_initialized'):
+        attempt = attempts.get(user_id, course_id, data.get('attempt'))
+        if attempt is None:
             return jsonify({'result': 'false', 'errorCode': '132'})  # Not initialized
         
         # Validate required elements
         if not cmi_key:
             return jsonify({'result': 'false', 'errorCode': '201'})  # Invalid argument
     
-        # Save or update data
-        scorm_data = ScormData.get_by_key(user_id, course_id, cmi_key)
-        if scorm_data:
-            scorm_data.cmi_value = cmi_value
-            scorm_data.updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            scorm_data.update()
-        else:
-            scorm_data = ScormData(
-                user_id=user_id,
-                course_id=course_id,
-                cmi_key=cmi_key,
-                cmi_value=cmi_value
-            )
-            scorm_data.save()
-        if cmi_key == 'cmi.core.lesson_status':
-            if cmi_value == 'passed':
-                # update certification in user_course to true
-                if not UserCourse.update(user_id=user_id, course_id=course_id):
-                    db.session.rollback()
-                    return jsonify({'result': 'false', 'errorCode': '101'})
+        # Save or update data; the database skips an unchanged value
+        if _persist_values(user_id, course_id, {cmi_key: cmi_value}):
+            attempts.mark_dirty(user_id, course_id, attempt)
         return jsonify({'result': 'true', 'errorCode': '0'})
         
     except Exception as e:
@@ -92,32 +229,43 @@ def scorm_set_value(course_id):
 def scorm_commit(course_id):
     """Commit SCORM data to persistent storage"""
     try:
-        if not session.get(f'scorm_{course_id}_initialized'):
+        user_id = current_user.id
+        attempt = attempts.get(user_id, course_id, (request.get_json(silent=True) or {}).get('attempt'))
+        if attempt is None:
             return jsonify({'result': 'false', 'errorCode': '132'})  # Not initialized
-        
+
+        # Flush the values buffered by the player since its last commit
+        _persist_values(user_id, course_id, _read_values(request.get_json(silent=True)))
+
         # Force commit any pending database changes
         db.session.commit()
+        attempts.mark_committed(user_id, course_id, attempt)
         return jsonify({'result': 'true', 'errorCode': '0'})
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'result': 'false', 'errorCode': '101'})
 
 @blp.route('/scorm/<int:course_id>/finish', methods=['POST'])
 def scorm_finish(course_id):
     """Finish SCORM session"""
     try:
-        if not session.get(f'scorm_{course_id}_initialized'):
+        user_id = current_user.id
+        attempt = attempts.get(user_id, course_id, (request.get_json(silent=True) or {}).get('attempt'))
+        if attempt is None:
             return jsonify({'result': 'false', 'errorCode': '132'})  # Not initialized
         
-        # Commit any final data
+        # Commit any final data, including values still buffered by the player
+        _persist_values(user_id, course_id, _read_values(request.get_json(silent=True)))
         db.session.commit()
         
-        # Clear session state
-        session.pop(f'scorm_{course_id}_initialized', None)
+        # Close the attempt
+        attempts.finish(user_id, course_id)
         
         return jsonify({'result': 'true', 'errorCode': '0'})
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'result': 'false', 'errorCode': '101'})
 
 @blp.route('/scorm/<int:course_id>/get_last_error', methods=['POST'])
@@ -144,3 +292,21 @@ def scorm_get_error_string(course_id):
 def scorm_get_diagnostic(course_id):
     """Get diagnostic information"""
     return jsonify({'result': '', 'errorCode': '0'})
+
+@blp.route('/scorm/stats', methods=['GET'])
+def scorm_stats():
+    """Runtime counters for this worker process"""
+    compression = dict(compression_stats)
+    compression['bytes_saved'] = compression['bytes_in'] - compression['bytes_stored']
+    return jsonify({
+        'attempts': {
+            'backend': current_app.config['SCORM_ATTEMPT_REGISTRY'],
+            'active': attempts.active_count(),
+            'cache': attempts.cache.stats()
+        },
+        'writes': {
+            'persisted': attempts.writes_persisted,
+            'elided': attempts.writes_elided
+        },
+        'compression': compression
+    })
@@ -1,15 +1,104 @@
+import base64
 from datetime import datetime, timezone
 from functools import wraps
-from flask import Blueprint, json, jsonify, render_template, request
+import uuid
 
+from flask import Blueprint, Response, abort, current_app, json, jsonify, render_template, request, stream_with_context, url_for
+from sqlalchemy import and_, cast, false, func, or_, true, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import joinedload
+
+from app.classes.completion_worker import completion_worker
+from app.classes.lru_cache import LRUCache
+from app.classes.statement_partitions import statement_partitions
+from app.classes.statement_rollups import WATERMARK, statement_rollups
+from app.classes.statement_spool import SpoolFull, statement_spool
 from app.db import db
 from app.models.activities import Activity
+from app.models.activity_rollups import ActivityAgentRollup, ActivityRollup
+from app.models.activity_states import ActivityState
 from app.models.agents import Agent
-from app.models.statements import Statement
+from app.models.completion_events import CompletionEvent
+from app.models.lrs_counters import LrsCounter
+from app.models.rollup_watermarks import RollupWatermark
+from app.models.statement_ids import StatementId
+from app.models.statements import LRS_FIELDS, Statement, dumps
+from app.models.verbs import Verb
 
 
 blp = Blueprint('lrs',__name__, url_prefix='/api/lrs')
 
+# Verbs that count as passing a course and trigger certification
+PASSED_VERBS = {'http://adlnet.gov/expapi/verbs/passed'}
+# Rows fetched per server-side cursor round trip when streaming statements
+STREAM_BATCH_SIZE = 500
+# Parts of a statement GET /statements/search can match, and the largest filter it takes
+SEARCH_KEYS = {'actor', 'verb', 'object', 'result', 'context'}
+SEARCH_FILTER_MAX_BYTES = 4096
+# Rows per page of the activity and agent listings in the web UI
+LISTING_PAGE_SIZE = 50
+
+
+
+class KnownEntities:
+    """Integer keys of the verbs, activities and agents this worker has already seen stored.
+
+    Statements reference verbs, activities and agents by key. The IRI/mbox
+    -> key maps never change once assigned and the same few values repeat
+    constantly, so a hit costs no query; misses are resolved with one query
+    per table. Keys created by an ingest transaction are remembered only
+    once it has committed.
+    """
+    MODELS = {'verbs': Verb, 'activities': Activity, 'agents': Agent}
+
+    def __init__(self):
+        self._maps = {}
+
+    def map(self, kind):
+        if kind not in self._maps:
+            self._maps[kind] = LRUCache(current_app.config['LRS_KNOWN_CACHE_SIZE'])
+        return self._maps[kind]
+
+    def _split(self, kind, values):
+        cache = self.map(kind)
+        keys, missing = {}, []
+        for value in values:
+            key = cache.get(value)
+            if key is None:
+                missing.append(value)
+            else:
+                keys[value] = key
+        return keys, missing
+
+    def lookup(self, kind, values):
+        """{value: key} for those of `values` that are stored."""
+        keys, missing = self._split(kind, values)
+        found = self.MODELS[kind].keys_for(missing)
+        self.remember(kind, found)
+        keys.update(found)
+        return keys
+
+    def resolve(self, kind, rows):
+        """Keys for every value of `rows` ({value: row}), inserting the rows not stored yet; the caller commits.
+
+        Returns ({value: key}, number of rows inserted, {value: key} to
+        `remember()` after the commit).
+        """
+        keys, missing = self._split(kind, rows)
+        model = self.MODELS[kind]
+        inserted = model.insert_many([rows[value] for value in missing])
+        resolved = model.keys_for(missing)
+        keys.update(resolved)
+        return keys, inserted, resolved
+
+    def remember(self, kind, keys):
+        cache = self.map(kind)
+        for value, key in keys.items():
+            cache.set(value, key)
+
+
+known = KnownEntities()
+
 # Authentication decorator for API endpoints
 def require_auth(f):
     @wraps(f)
@@ -25,148 +114,627 @@ def check_auth(username, password):
     # return username == 'lrs_user' and password == 'lrs_password'
     return True
 
+def _agent_key(agent):
+    """The identifier an xAPI agent is stored under: its mbox, or a prefixed mbox_sha1sum, openid or account."""
+    if not isinstance(agent, dict):
+        raise ValueError('Invalid agent format')
+    if agent.get('mbox'):
+        return agent['mbox']
+    if agent.get('mbox_sha1sum'):
+        return f"sha1:{agent['mbox_sha1sum']}"
+    if agent.get('openid'):
+        return f"openid:{agent['openid']}"
+    account = agent.get('account')
+    if isinstance(account, dict) and account.get('homePage') and account.get('name'):
+        return f"account:{account['homePage']}|{account['name']}"
+    raise ValueError('Agent must have an mbox, mbox_sha1sum, openid or account')
+
+def _state_context(args):
+    """(agent, activityId, registration) of a State API request; raises ValueError if invalid."""
+    activity_id = args.get('activityId')
+    if not activity_id:
+        raise ValueError('activityId is required')
+    try:
+        agent = json.loads(args.get('agent') or 'null')
+    except ValueError:
+        raise ValueError('Invalid agent format')
+    registration = args.get('registration') or ''
+    if registration:
+        try:
+            registration = str(uuid.UUID(registration))
+        except ValueError:
+            raise ValueError('registration must be a UUID')
+    return _agent_key(agent), activity_id, registration
+
+def _state_precondition(existing):
+    """False if If-Match / If-None-Match rule out writing over `existing` (None when there is no document)."""
+    if request.if_match and (existing is None or not request.if_match.contains(existing.etag)):
+        return False
+    if request.if_none_match and existing is not None and request.if_none_match.contains(existing.etag):
+        return False
+    return True
+
+def _aware(value):
+    # SQLite hands timestamps back without their zone; they are stored as UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class StateCache:
+    """State documents of recently active attempts, per (agent, activityId, registration).
+
+    A resuming course reads its state right after launch; the first GET
+    loads every state of the attempt in one indexed query and the rest are
+    answered from memory. Writes through this worker drop the entry, writes
+    through other workers show up once LRS_STATE_CACHE_TTL runs out.
+    If-Match and If-None-Match on writes are always checked against the
+    database, never the cache.
+    """
+
+    def __init__(self):
+        self._cache = None
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            self._cache = LRUCache(current_app.config['LRS_STATE_CACHE_SIZE'], ttl=current_app.config['LRS_STATE_CACHE_TTL'])
+        return self._cache
+
+    def get(self, context):
+        """{stateId: (etag, content_type, document, updated)} for one attempt."""
+        states = self.cache.get(context)
+        if states is None:
+            states = {
+                row.state_id: (row.etag, row.content_type, row.document, _aware(row.updated))
+                for row in ActivityState.context(*context)
+            }
+            self.cache.set(context, states)
+        return states
+
+    def invalidate(self, context):
+        self.cache.pop(context)
+
+
+state_cache = StateCache()
+
 @blp.route('/activities/state', methods=['GET'])
+@require_auth
 def get_activity_state():
-    state_id = request.args.get("stateId")
-    activity_id = request.args.get("activityId")
-    agent = request.args.get("agent")  # This will be a JSON string
-    
-    # Optional: Parse agent JSON safely
+    """xAPI State API: one document by stateId, or the stateIds of the attempt (changed after `since`, if given)."""
     try:
-        agent_data = json.loads(agent) if agent else {}
-    except Exception as e:
-        return jsonify({"error": "Invalid agent format"}), 400
+        context = _state_context(request.args)
+        since = request.args.get('since')
+        since = _aware(datetime.fromisoformat(since.replace('Z', '+00:00'))) if since else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    return jsonify({
-        "stateId": state_id,
-        "activityId": activity_id,
-        "agent": agent_data
-    })
+    states = state_cache.get(context)
+    state_id = request.args.get('stateId')
+    if state_id is None:
+        return jsonify(sorted(key for key, state in states.items() if since is None or state[3] > since))
+    if state_id not in states:
+        return jsonify({'error': 'State not found'}), 404
+
+    etag, content_type, document, _ = states[state_id]
+    response = Response(document, content_type=content_type)
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+@blp.route('/activities/state', methods=['PUT', 'POST'])
+@require_auth
+def put_activity_state():
+    """Store a state document (PUT), or merge a JSON object into the stored one (POST).
+
+    The row is locked while If-Match / If-None-Match are checked against its
+    etag, so of two writers holding the same etag only the first succeeds;
+    the other gets 412.
+    """
+    try:
+        context = _state_context(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    state_id = request.args.get('stateId')
+    if not state_id:
+        return jsonify({'error': 'stateId is required'}), 400
+    document = request.get_data()
+    content_type = request.content_type or 'application/octet-stream'
+
+    try:
+        existing = ActivityState.find(*context, state_id, for_update=True)
+        if not _state_precondition(existing):
+            db.session.rollback()
+            return jsonify({'error': 'Precondition failed'}), 412
+        if request.method == 'POST' and existing is not None:
+            try:
+                stored, posted = json.loads(existing.document), json.loads(document)
+            except ValueError:
+                stored = posted = None
+            if not isinstance(stored, dict) or not isinstance(posted, dict):
+                db.session.rollback()
+                return jsonify({'error': 'POST can only merge a JSON object into a JSON object'}), 400
+            document, content_type = dumps({**stored, **posted}).encode(), 'application/json'
+
+        etag = ActivityState.write(*context, state_id, document, content_type, existing=existing,
+                                   create_only=bool(request.if_none_match))
+        if etag is None:
+            # Created by a concurrent request after our lookup
+            db.session.rollback()
+            return jsonify({'error': 'Precondition failed'}), 412
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    state_cache.invalidate(context)
+
+    response = Response(status=204)
+    response.set_etag(etag)
+    return response
+
+@blp.route('/activities/state', methods=['DELETE'])
+@require_auth
+def delete_activity_state():
+    """Delete one state document (honouring If-Match), or every state of the attempt when stateId is omitted."""
+    try:
+        context = _state_context(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    state_id = request.args.get('stateId')
+
+    try:
+        if state_id:
+            existing = ActivityState.find(*context, state_id, for_update=True)
+            if not _state_precondition(existing):
+                db.session.rollback()
+                return jsonify({'error': 'Precondition failed'}), 412
+            if existing is not None:
+                db.session.delete(existing)
+        else:
+            ActivityState.context(*context).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    state_cache.invalidate(context)
+    return '', 204
 
 @blp.route('/statements', methods=['PUT'])
 @require_auth
 def post_statement():
+    """Store a single statement under the client's statementId.
+
+    The statementId is the primary key and the insert is ON CONFLICT (id) DO
+    NOTHING, so a retried PUT is a no-op instead of a duplicate row.
+    """
+    statement_id = request.args.get("statementId")
+    batch = _read_statements()
+    if not batch or len(batch) != 1 or not isinstance(batch[0], dict):
+        return jsonify({'error': 'Request body must be a single statement'}), 400
+    statement_data = batch[0]
+    if statement_id:
+        if statement_data.get('id') and statement_data['id'] != statement_id:
+            return jsonify({'error': 'statementId does not match the statement id'}), 400
+        statement_data['id'] = statement_id
+
+    authority = request.authorization.username if request.authorization else None
     try:
-        statement_id = request.args.get("statementId")
-        print(statement_id)
-        print(request.get_json())
-        if request.content_type == 'application/json':
-            statement_data = request.get_json()
-        else:
-            statement_data = json.loads(request.data)
-        
-        # # Extract statement components
-        actor = statement_data.get('actor', {})
-        verb = statement_data.get('verb', {})
-        obj = statement_data.get('object', {})
-        result = statement_data.get('result', {})
-        context = statement_data.get('context', {})
-        
-        # Create new statement
-        statement = Statement(
-            actor_mbox=actor.get('mbox'),
-            actor_name=actor.get('name'),
-            verb_id=verb.get('id'),
-            verb_display=verb.get('display', {}).get('en-US'),
-            object_id=obj.get('id'),
-            object_definition=json.dumps(obj.get('definition')) if obj.get('definition') else None,
-            result_completion=result.get('completion'),
-            result_success=result.get('success'),
-            result_score_raw=result.get('score', {}).get('raw') if result.get('score') else None,
-            result_score_min=result.get('score', {}).get('min') if result.get('score') else None,
-            result_score_max=result.get('score', {}).get('max') if result.get('score') else None,
-            result_score_scaled=result.get('score', {}).get('scaled') if result.get('score') else None,
-            context_instructor=context.get('instructor'),
-            context_team=context.get('team'),
-            timestamp=datetime.fromisoformat(statement_data.get('timestamp').replace('Z', '+00:00')) if statement_data.get('timestamp') else datetime.now(timezone.utc),
-            authority=request.authorization.username if request.authorization else None,
-            raw_statement=json.dumps(statement_data)
-        )
-        statement.save()
-        # db.session.add(statement)
-        
-        # Add activity if it doesn't exist
-        activity_id = obj.get('id')
-        if activity_id:
-            existing_activity = Activity.query.filter_by(id=activity_id).first()
-            if not existing_activity:
-                activity = Activity(
-                    id=activity_id,
-                    name=obj.get('definition', {}).get('name', {}).get('en-US'),
-                    description=obj.get('definition', {}).get('description', {}).get('en-US'),
-                    type=obj.get('definition', {}).get('type')
-                )
-                activity.save()
-                # db.session.add(activity)
-        
-        # Add agent if it doesn't exist
-        actor_mbox = actor.get('mbox')
-        if actor_mbox:
-            existing_agent = Agent.query.filter_by(mbox=actor_mbox).first()
-            if not existing_agent:
-                agent = Agent(
-                    mbox=actor_mbox,
-                    name=actor.get('name')
-                )
-                agent.save()
-                # db.session.add(agent)
-        
-        # db.session.commit()
-        
-        # return jsonify([statement.id]), 200
-        return jsonify([statement_id]), 200
-        
+        row = _parse_statement(statement_data, authority)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if current_app.config['LRS_INGEST_MODE'] == 'spool':
+        return _spool_statements([statement_data], [row], authority)
+    try:
+        return jsonify(_store_statements([statement_data], [row])), 200
     except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+
+def _parse_statement(statement_data, authority, stored=None):
+    """Validate one xAPI statement and return its `statements` row, less the actor/verb/object keys; raises ValueError."""
+    if not isinstance(statement_data, dict):
+        raise ValueError('Statement must be a JSON object')
+    actor = statement_data.get('actor') or {}
+    verb = statement_data.get('verb') or {}
+    obj = statement_data.get('object') or {}
+    result = statement_data.get('result') or {}
+    context = statement_data.get('context') or {}
+    if not all(isinstance(part, dict) for part in (actor, verb, obj, result, context)):
+        raise ValueError('Statement actor, verb, object, result and context must be JSON objects')
+    score = result.get('score') or {}
+    if not verb.get('id'):
+        raise ValueError('Statement is missing verb.id')
+    if not obj.get('id'):
+        raise ValueError('Statement is missing object.id')
+
+    statement_id = statement_data.get('id')
+    try:
+        statement_id = str(uuid.UUID(statement_id)) if statement_id else str(uuid.uuid4())
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError(f'Invalid statement id: {statement_id}')
+    timestamp = statement_data.get('timestamp')
+    try:
+        timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00')) if timestamp else datetime.now(timezone.utc)
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError(f'Invalid timestamp: {timestamp}')
+
+    return {
+        'id': statement_id,
+        'client_id': statement_id if statement_data.get('id') else None,
+        'object_definition': json.dumps(obj.get('definition')) if obj.get('definition') else None,
+        'result_completion': result.get('completion'),
+        'result_success': result.get('success'),
+        'result_score_raw': score.get('raw'),
+        'result_score_min': score.get('min'),
+        'result_score_max': score.get('max'),
+        'result_score_scaled': score.get('scaled'),
+        'context_instructor': context.get('instructor'),
+        'context_team': context.get('team'),
+        'timestamp': timestamp,
+        'stored': stored or datetime.now(timezone.utc),
+        'authority': authority,
+        'version': '1.0.3',
+        'voided': False,
+        'raw_statement': dumps({key: value for key, value in statement_data.items() if key not in LRS_FIELDS})
+    }
+
+
+def _read_statements():
+    """The request body as a list of statements, or None if it is not JSON."""
+    if request.content_type == 'application/json':
+        payload = request.get_json(silent=True)
+    else:
+        try:
+            payload = json.loads(request.data)
+        except ValueError:
+            payload = None
+    if payload is None:
+        return None
+    return payload if isinstance(payload, list) else [payload]
+
+
+def _store_statements(batch, rows):
+    """Store validated statements with their new verbs, activities and agents in one transaction.
+
+    Statements and each kind of new entity are written with one bulk
+    INSERT ... ON CONFLICT DO NOTHING, so storing a batch twice is harmless.
+    Rolls back and re-raises on database errors.
+    """
+    statements, references, verbs, activities, agents, passed = {}, {}, {}, {}, {}, []
+    for statement_data, row in zip(batch, rows):
+        if row['id'] in statements:
+            continue
+        statements[row['id']] = row
+        actor = statement_data.get('actor') or {}
+        verb = statement_data['verb']
+        obj = statement_data['object']
+        definition = obj.get('definition') or {}
+        references[row['id']] = (actor.get('mbox'), verb['id'], obj['id'])
+        verbs.setdefault(verb['id'], {'id': verb['id'], 'display': (verb.get('display') or {}).get('en-US')})
+        activities.setdefault(obj['id'], {
+            'id': obj['id'],
+            'name': (definition.get('name') or {}).get('en-US'),
+            'description': (definition.get('description') or {}).get('en-US'),
+            'type': definition.get('type')
+        })
+        if actor.get('mbox'):
+            agents.setdefault(actor['mbox'], {'mbox': actor['mbox'], 'name': actor.get('name')})
+            if verb['id'] in PASSED_VERBS:
+                passed.append((actor['mbox'], obj['id']))
+
+    statement_partitions.ensure_current(current_app.config['LRS_PARTITION_MONTHS_AHEAD'])
+    try:
+        verb_keys, _, new_verbs = known.resolve('verbs', verbs)
+        activity_keys, activities_added, new_activities = known.resolve('activities', activities)
+        agent_keys, agents_added, new_agents = known.resolve('agents', agents)
+        for statement_id, (mbox, verb_id, activity_id) in references.items():
+            row = statements[statement_id]
+            row['actor_key'] = agent_keys.get(mbox)
+            row['verb_key'] = verb_keys[verb_id]
+            row['object_key'] = activity_keys[activity_id]
+        LrsCounter.increment(
+            statements=Statement.insert_many(list(statements.values())),
+            activities=activities_added,
+            agents=agents_added
+        )
+        # Queue certification; committed together with the statements
+        for actor_mbox, activity_id in passed:
+            CompletionEvent.enqueue_xapi(actor_mbox, activity_id)
+        db.session.commit()
+    except Exception:
         db.session.rollback()
+        raise
+    known.remember('verbs', new_verbs)
+    known.remember('activities', new_activities)
+    known.remember('agents', new_agents)
+    statement_rollups.ensure_started(current_app._get_current_object())
+    if passed:
+        completion_worker.ensure_started(current_app._get_current_object())
+    return list(statements)
+
+
+def store_spooled(records):
+    """Statement spool writer: store a run of spooled records in one transaction."""
+    batch, rows = [], []
+    for record in records:
+        stored = datetime.fromtimestamp(record['spooled_at'], timezone.utc)
+        # The ids acknowledged to the client; older spool files fixed them into the statements
+        ids = record.get('ids') or [None] * len(record['statements'])
+        for statement_data, statement_id in zip(record['statements'], ids):
+            row = _parse_statement(statement_data, record['authority'], stored)
+            if statement_id:
+                row['id'] = statement_id
+            batch.append(statement_data)
+            rows.append(row)
+    _store_statements(batch, rows)
+
+
+def _spool_statements(batch, rows, authority):
+    """Acknowledge statements once they are durably spooled; stored later by the spool writer."""
+    statement_spool.ensure_started(current_app._get_current_object(), store_spooled)
+    try:
+        # The ids are fixed now so a replayed spool does not store the statement twice
+        statement_spool.append(authority, batch, [row['id'] for row in rows])
+    except SpoolFull:
+        response = jsonify({'error': 'LRS is busy, retry later'})
+        response.headers['Retry-After'] = str(current_app.config['LRS_SPOOL_RETRY_AFTER'])
+        return response, 503
+    return jsonify([row['id'] for row in rows]), 200
+
+
+@blp.route('/statements', methods=['POST'])
+@require_auth
+def post_statements():
+    """Store one statement or an array of statements in a single transaction and return their ids.
+
+    Every statement is validated before anything is written; a batch that
+    repeats a statement id is rejected. With LRS_INGEST_MODE=spool they are acknowledged once spooled to local disk
+    and written to the database in the background.
+    """
+    batch = _read_statements()
+    if batch is None:
+        return jsonify({'error': 'Request body must be a statement or an array of statements'}), 400
+
+    authority = request.authorization.username if request.authorization else None
+    try:
+        rows = [_parse_statement(statement_data, authority) for statement_data in batch]
+    except ValueError as e:
         return jsonify({'error': str(e)}), 400
-    
+    # Clients match the returned ids to their statements by position, so each id may appear once
+    seen = set()
+    for row in rows:
+        if row['id'] in seen:
+            return jsonify({'error': f"Statement id {row['id']} appears more than once in the batch"}), 400
+        seen.add(row['id'])
+
+    if current_app.config['LRS_INGEST_MODE'] == 'spool':
+        return _spool_statements(batch, rows, authority)
+    try:
+        return jsonify(_store_statements(batch, rows)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+
+def _encode_cursor(statement):
+    """Opaque continuation token for the (stored, id) position after `statement`."""
+    position = json.dumps([statement.stored.isoformat(), statement.id])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        stored, statement_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(stored), statement_id
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+
+def _page_query(query, limit, cursor=None):
+    """Keyset page query: `limit` + 1 statements after `cursor`, newest first.
+
+    Pages on (stored, id), backed by the idx_statements_live_* indexes: no
+    COUNT(*) and no OFFSET, so deep pages cost the same as the first.
+    """
+    if cursor:
+        query = query.filter(tuple_(Statement.stored, Statement.id) < _decode_cursor(cursor))
+    return query.order_by(Statement.stored.desc(), Statement.id.desc()).limit(limit + 1)
+
+
+def _statement_page(query, limit, cursor=None):
+    """One page of statements and the cursor for the next page (None on the last)."""
+    statements = _page_query(query, limit, cursor).all()
+    if len(statements) > limit:
+        return statements[:limit], _encode_cursor(statements[limit - 1])
+    return statements, None
+
 
 @blp.route('/statements', methods=['GET'])
-@require_auth
 def get_statements():
+    # Browsers get the web view that shares this URL, xAPI clients the JSON API
+    if request.accept_mimetypes.best_match(['application/json', 'text/html']) == 'text/html':
+        return statements()
+    return query_statements()
+
+
+def _filter_statements(args):
+    """Statement query for the xAPI filter parameters in `args` (agent, verb, activity, since, until).
+
+    Each combination is served by one of the partial indexes on statements
+    (see migration b4d6f8a0c213 and benchmarks/lrs_explain.py).
+    """
+    agent_mbox = args.get('agent')
+    verb_id = args.get('verb')
+    activity_id = args.get('activity')
+    since = args.get('since')
+    until = args.get('until')
+
+    query = Statement.query.filter_by(voided=False)
+
+    # Filter values are resolved to keys through the per-worker maps; a value
+    # that was never stored matches nothing
+    for kind, value, column in (('agents', agent_mbox, Statement.actor_key),
+                                ('verbs', verb_id, Statement.verb_key),
+                                ('activities', activity_id, Statement.object_key)):
+        if value:
+            key = known.lookup(kind, [value]).get(value)
+            query = query.filter(column == key) if key is not None else query.filter(false())
+    # since/until are on `stored` (as xAPI defines them), so PostgreSQL only
+    # scans the monthly partitions in range
+    if since:
+        since_date = datetime.fromisoformat(since.replace('Z', '+00:00'))
+        query = query.filter(Statement.stored > since_date)
+    if until:
+        until_date = datetime.fromisoformat(until.replace('Z', '+00:00'))
+        query = query.filter(Statement.stored <= until_date)
+    return query
+
+
+def _stream_statements(query, stream, limit=None):
+    """Stream the statements of `query` as NDJSON or as a chunked xAPI result object.
+
+    Rows are read through a server-side cursor (yield_per) and serialised
+    one by one, so memory stays flat however many statements match. With a
+    `limit` the query is a keyset page query (limit + 1 rows) and the JSON
+    form ends with the usual `more` URL.
+    """
+    if stream not in ('ndjson', 'json'):
+        return jsonify({'error': "stream must be 'ndjson' or 'json'"}), 400
+    args = request.args.to_dict()
+
+    def generate():
+        chunk, sent, last, has_more = [], 0, None, False
+        if stream == 'json':
+            yield '{"statements":['
+        for statement in query.yield_per(STREAM_BATCH_SIZE):
+            if limit is not None and sent == limit:
+                has_more = True
+                break
+            line = statement.to_json()
+            chunk.append(line + '\n' if stream == 'ndjson' else (',' if sent else '') + line)
+            sent += 1
+            last = statement
+            if len(chunk) == STREAM_BATCH_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+        yield ''.join(chunk)
+        if stream == 'json':
+            more = ''
+            if has_more:
+                args['cursor'] = _encode_cursor(last)
+                more = url_for('lrs.get_statements', **args)
+            yield f'],"more":{dumps(more)}}}'
+
+    mimetype = 'application/x-ndjson' if stream == 'ndjson' else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+@require_auth
+def query_statements():
     try:
-        # Parse query parameters
-        agent_mbox = request.args.get('agent')
-        verb_id = request.args.get('verb')
-        activity_id = request.args.get('activity')
-        since = request.args.get('since')
-        until = request.args.get('until')
         limit = request.args.get('limit', 100, type=int)
-        
-        query = Statement.query.filter_by(voided=False)
-        
-        if agent_mbox:
-            query = query.filter(Statement.actor_mbox == agent_mbox)
-        if verb_id:
-            query = query.filter(Statement.verb_id == verb_id)
-        if activity_id:
-            query = query.filter(Statement.object_id == activity_id)
-        if since:
-            since_date = datetime.fromisoformat(since.replace('Z', '+00:00'))
-            query = query.filter(Statement.timestamp >= since_date)
-        if until:
-            until_date = datetime.fromisoformat(until.replace('Z', '+00:00'))
-            query = query.filter(Statement.timestamp <= until_date)
-        
-        statements = query.order_by(Statement.stored.desc()).limit(limit).all()
-        
-        return jsonify({
-            'statements': [stmt.to_dict() for stmt in statements],
-            'more': len(statements) == limit
-        }), 200
+        if limit <= 0:
+            limit = 100
+
+        query = _filter_statements(request.args)
+        stream = request.args.get('stream')
+        if not stream and request.accept_mimetypes.best == 'application/x-ndjson':
+            stream = 'ndjson'
+        if request.args.get('export') in ('1', 'true'):
+            # Everything that matches the filters, oldest first, streamed
+            return _stream_statements(query.order_by(Statement.stored, Statement.id), stream or 'ndjson')
+        if stream:
+            return _stream_statements(_page_query(query, limit, request.args.get('cursor')), stream, limit)
+
+        statements, cursor = _statement_page(query, limit, request.args.get('cursor'))
+        return _statements_response(statements, cursor, 'lrs.get_statements')
         
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+def _statements_response(statements, cursor, endpoint):
+    """A StatementResult page; `more` repeats the request's arguments with the next cursor."""
+    more = ''
+    if cursor:
+        args = request.args.to_dict()
+        args['cursor'] = cursor
+        more = url_for(endpoint, **args)
+
+    # Raw statements are spliced in as stored, not decoded and re-encoded
+    body = f'{{"statements":[{",".join(stmt.to_json() for stmt in statements)}],"more":{dumps(more)}}}'
+    return Response(body, mimetype='application/json'), 200
+
+def _search_filter(text):
+    """Parse and check a GET /statements/search filter document; raises ValueError."""
+    if len(text) > SEARCH_FILTER_MAX_BYTES:
+        raise ValueError(f'filter is longer than {SEARCH_FILTER_MAX_BYTES} bytes')
+    try:
+        document = json.loads(text)
+    except ValueError:
+        raise ValueError('filter must be a JSON object')
+    if not isinstance(document, dict) or not document:
+        raise ValueError('filter must be a non-empty JSON object')
+    if not set(document) <= SEARCH_KEYS:
+        raise ValueError(f"filter can only match {', '.join(sorted(SEARCH_KEYS))}")
+    return document
+
+def _json_leaves(value, path='$'):
+    # (JSON path, scalar) pairs of a filter document, for databases without JSONB
+    if isinstance(value, list):
+        raise ValueError('Array filters need PostgreSQL')
+    if not isinstance(value, dict):
+        yield path, value
+        return
+    for key, item in value.items():
+        if '"' in key:
+            raise ValueError('filter keys cannot contain double quotes')
+        yield from _json_leaves(item, f'{path}."{key}"')
+
+def _contains(document):
+    """Condition: the statement's raw_statement contains `document`.
+
+    On PostgreSQL this is a JSONB @> test that the GIN index
+    idx_statements_live_raw answers. Elsewhere each scalar of the document
+    is compared with json_extract(), which handles objects but not arrays.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        return Statement.raw_statement.op('@>')(cast(dumps(document), postgresql.JSONB))
+    return and_(true(), *(func.json_extract(Statement.raw_statement, path) == value
+                          for path, value in _json_leaves(document)))
+
+@blp.route('/statements/search', methods=['GET'])
+@require_auth
+def search_statements():
+    """Statements whose JSON contains the `filter` document, newest first.
+
+    e.g. filter={"context":{"registration":"<uuid>"}} or
+    filter={"result":{"extensions":{"<iri>":true}}}. Only actor, verb,
+    object, result and context can be matched. The GET /statements
+    parameters (agent, verb, activity, since, until, limit, cursor) narrow
+    the search further; since/until also limit the partitions scanned.
+    """
+    try:
+        document = _search_filter(request.args.get('filter') or '')
+        limit = request.args.get('limit', 100, type=int)
+        if limit <= 0:
+            limit = 100
+        query = _filter_statements(request.args).filter(_contains(document))
+        statements, cursor = _statement_page(query, limit, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return _statements_response(statements, cursor, 'lrs.search_statements')
+
 @blp.route('/statements/<statement_id>', methods=['GET'])
 @require_auth
 def get_statement(statement_id):
     try:
-        statement = Statement.query.filter_by(id=statement_id, voided=False).first()
+        query = Statement.query.filter_by(id=statement_id, voided=False)
+        # The claimed stored time narrows the lookup to one partition
+        stored = StatementId.get_stored(statement_id)
+        if stored is not None:
+            query = query.filter(Statement.stored == stored)
+        statement = query.first()
         if not statement:
             return jsonify({'error': 'Statement not found'}), 404
         
-        return jsonify(statement.to_dict()), 200
+        return Response(statement.to_json(), mimetype='application/json'), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -191,6 +759,51 @@ def get_activity(activity_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+def _rollups_as_of():
+    watermark = RollupWatermark.get(WATERMARK)
+    return watermark.stored if watermark else None
+
+@blp.route('/aggregates', methods=['GET'])
+@require_auth
+def get_aggregates():
+    """Rollup of an activity, or of one learner (agent mbox) on it; a primary key lookup, never a statement scan.
+
+    `as_of` is the stored time of the last statement folded in.
+    """
+    activity_id = request.args.get('activity')
+    if not activity_id:
+        return jsonify({'error': 'activity is required'}), 400
+    agent = request.args.get('agent')
+    if agent:
+        rollup = db.session.get(ActivityAgentRollup, (activity_id, agent))
+    else:
+        rollup = db.session.get(ActivityRollup, activity_id)
+    if rollup is None:
+        return jsonify({'error': 'No statements rolled up for this activity' + (' and agent' if agent else '')}), 404
+    return jsonify({**rollup.json(), 'as_of': _rollups_as_of()})
+
+@blp.route('/aggregates/agents', methods=['GET'])
+@require_auth
+def get_agent_aggregates():
+    """Per-learner rollups of an activity, `limit` at a time in agent order; `more` holds the next page's URL."""
+    activity_id = request.args.get('activity')
+    if not activity_id:
+        return jsonify({'error': 'activity is required'}), 400
+    limit = request.args.get('limit', 100, type=int)
+    if limit <= 0:
+        limit = 100
+    query = ActivityAgentRollup.query.filter_by(activity_id=activity_id)
+    after = request.args.get('after')
+    if after:
+        query = query.filter(ActivityAgentRollup.agent > after)
+    rollups = query.order_by(ActivityAgentRollup.agent).limit(limit + 1).all()
+
+    more = ''
+    if len(rollups) > limit:
+        rollups = rollups[:limit]
+        more = url_for('lrs.get_agent_aggregates', activity=activity_id, limit=limit, after=rollups[-1].agent)
+    return jsonify({'agents': [rollup.json() for rollup in rollups], 'more': more, 'as_of': _rollups_as_of()})
+
 @blp.route('/about', methods=['GET'])
 def about():
     return jsonify({
@@ -198,41 +811,90 @@ def about():
         'extensions': {}
     }), 200
 
+@blp.route('/stats', methods=['GET'])
+def lrs_stats():
+    """LRS totals, plus runtime counters for this worker process"""
+    return jsonify({
+        'totals': LrsCounter.totals(),
+        'known_verbs': known.map('verbs').stats(),
+        'known_activities': known.map('activities').stats(),
+        'known_agents': known.map('agents').stats(),
+        'ingest_mode': current_app.config['LRS_INGEST_MODE'],
+        'spool': statement_spool.stats(),
+        'state_cache': state_cache.cache.stats()
+    })
+
 # Web Interface Routes
+def _with_references(query):
+    # The pages show actor, verb and object by name; load them in the same query
+    return query.options(joinedload(Statement.actor), joinedload(Statement.verb), joinedload(Statement.activity))
+
 @blp.route('/')
 def index():
-    total_statements = Statement.query.filter_by(voided=False).count()
-    total_activities = Activity.query.count()
-    total_agents = Agent.query.count()
+    # Maintained by the ingestion path; no COUNT(*) per page view
+    totals = LrsCounter.totals()
+    total_statements = totals.get('statements') or 0
+    total_activities = totals.get('activities') or 0
+    total_agents = totals.get('agents') or 0
     
-    recent_statements = Statement.query.filter_by(voided=False).order_by(Statement.stored.desc()).limit(10).all()
+    recent_statements, _ = _statement_page(_with_references(Statement.query.filter_by(voided=False)), 10)
     
-    return render_template('index.html', 
+    return render_template('lrs/index.html', 
                          total_statements=total_statements,
                          total_activities=total_activities,
                          total_agents=total_agents,
                          recent_statements=recent_statements)
 
-@blp.route('/statements')
 def statements():
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    
-    statements = Statement.query.filter_by(voided=False).order_by(Statement.stored.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    """Web view of GET /statements, paged with the same cursors as the API"""
+    cursor = request.args.get('cursor')
+    try:
+        statements, next_cursor = _statement_page(_with_references(Statement.query.filter_by(voided=False)), 20, cursor)
+    except ValueError:
+        abort(400)
     
-    return render_template('statements.html', statements=statements)
+    return render_template('lrs/statements.html', statements=statements, cursor=cursor, next_cursor=next_cursor)
+
+def _prefix(column, text):
+    """column LIKE 'text%', with LIKE wildcards in `text` matched literally."""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return column.like(escaped + '%', escape='\\')
+
+def _key_page(query, key, limit):
+    """One page of a listing, newest (highest key) first, after the `cursor` request argument.
+
+    Returns the rows and the cursor for the next page (None on the last).
+    """
+    cursor = request.args.get('cursor', type=int)
+    if cursor is not None:
+        query = query.filter(key < cursor)
+    rows = query.order_by(key.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], getattr(rows[limit - 1], key.key)
+    return rows, None
 
 @blp.route('/activities')
 def activities():
-    activities = Activity.query.order_by(Activity.created_at.desc()).all()
-    return render_template('activities.html', activities=activities)
+    """Activities, newest first, optionally by name or IRI prefix (`q`)"""
+    query = Activity.query
+    search = (request.args.get('q') or '').strip()
+    if search:
+        query = query.filter(or_(_prefix(func.lower(Activity.name), search.lower()), _prefix(Activity.id, search)))
+    activities, next_cursor = _key_page(query, Activity.key, LISTING_PAGE_SIZE)
+    return render_template('lrs/activities.html', activities=activities, search=search,
+                           cursor=request.args.get('cursor'), next_cursor=next_cursor)
 
 @blp.route('/agents')
 def agents():
-    agents = Agent.query.order_by(Agent.created_at.desc()).all()
-    return render_template('agents.html', agents=agents)
+    """Agents, newest first, optionally by name or mbox prefix (`q`, with or without mailto:)"""
+    query = Agent.query
+    search = (request.args.get('q') or '').strip()
+    if search:
+        mbox = search if search.startswith('mailto:') else f'mailto:{search}'
+        query = query.filter(or_(_prefix(func.lower(Agent.name), search.lower()), _prefix(Agent.mbox, mbox)))
+    agents, next_cursor = _key_page(query, Agent.id, LISTING_PAGE_SIZE)
+    return render_template('lrs/agents.html', agents=agents, search=search,
+                           cursor=request.args.get('cursor'), next_cursor=next_cursor)
 
 @blp.route('/statement/<statement_id>')
 def statement_detail(statement_id):
@@ -243,12 +905,14 @@ def statement_detail(statement_id):
 @blp.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,X-Experience-API-Version')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,X-Experience-API-Version,If-Match,If-None-Match')
+    response.headers.add('Access-Control-Expose-Headers', 'ETag')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     response.headers.add('Access-Control-Allow-Credentials', 'true')
     return response
 
 @blp.route('/statements', methods=['OPTIONS'])
+@blp.route('/activities/state', methods=['OPTIONS'])
 @blp.route('/activities/<path:activity_id>', methods=['OPTIONS'])
 def handle_options():
     return '', 200
\ No newline at end of file
@@ -17,6 +17,7 @@ class SCORMParser:
         self.description = description
         self.scorm_version = None
         self.duplicate_package_path = None
+        self.xapi_activity_id = None
 
     def to_json(self):
         return {
@@ -30,7 +31,8 @@ class SCORMParser:
             "title":self.title,
             "description":self.description,
             "scorm_version":self.scorm_version,
-            "duplicate_package_path":self.duplicate_package_path
+            "duplicate_package_path":self.duplicate_package_path,
+            "xapi_activity_id":self.xapi_activity_id
         }
 
     def extract_package(self):
@@ -40,8 +42,20 @@ class SCORMParser:
         self.manifest_path = os.path.join(self.package_path, 'imsmanifest.xml')
         if not os.path.exists(self.manifest_path):
             raise FileNotFoundError(f"Manifest not found: {self.manifest_path}")
+        self._parse_tincan()
         return self._parse_manifest()
 
+    def _parse_tincan(self):
+        """Read the course activity id from tincan.xml (Storyline/Rise xAPI output), if the package has one."""
+        tincan_path = os.path.join(self.package_path, 'tincan.xml')
+        if not os.path.exists(tincan_path):
+            return
+        root = etree.parse(tincan_path).getroot()
+        nsmap = {'tc': 'http://projecttincan.com/tincan.xsd'}
+        activity_ids = root.xpath('//tc:activity[@type="http://adlnet.gov/expapi/activities/course"]/@id', namespaces=nsmap) \
+            or root.xpath('//tc:activity/@id', namespaces=nsmap)
+        self.xapi_activity_id = activity_ids[0] if activity_ids else None
+
     def _parse_manifest(self):
         tree = etree.parse(self.manifest_path)
         root = tree.getroot()
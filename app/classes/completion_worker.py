@@ -0,0 +1,65 @@
+import logging
+import threading
+
+from app.db import db
+from app.models.completion_events import CompletionEvent
+
+# Import centralized loggers
+try:
+    from app import error_logger
+except ImportError:
+    error_logger = logging.getLogger('error')
+
+
+class CompletionWorker:
+    """Background thread that turns queued completion events into certificates.
+
+    Started lazily by the first request that queues an event. Every
+    COMPLETION_BATCH_INTERVAL seconds it drains the completion_events table in
+    batches of COMPLETION_BATCH_SIZE. Events sit in the database, so anything a
+    crashed worker left behind is picked up by the next run (or by
+    `flask scorm issue-certificates`).
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def ensure_started(self, app):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, args=(app,), name='completion-worker', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, app):
+        interval = app.config['COMPLETION_BATCH_INTERVAL']
+        batch_size = app.config['COMPLETION_BATCH_SIZE']
+        while not self._stop.wait(interval):
+            with app.app_context():
+                try:
+                    drain(batch_size)
+                except Exception as ex:
+                    db.session.rollback()
+                    error_logger.error(f"Completion worker batch failed, will retry: {ex}")
+                finally:
+                    db.session.remove()
+
+
+def drain(batch_size):
+    """Apply pending completion events until a batch comes back short; returns the total applied."""
+    total = 0
+    while True:
+        applied = CompletionEvent.apply_pending(batch_size)
+        total += applied
+        if applied < batch_size:
+            return total
+
+
+completion_worker = CompletionWorker()
@@ -0,0 +1,116 @@
+from datetime import datetime, timezone
+import logging
+import re
+import threading
+
+from app.db import db
+
+# Import centralized loggers
+try:
+    from app import activity_logger
+except ImportError:
+    activity_logger = logging.getLogger('activity')
+
+UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+LOWER_BOUND = re.compile(r"FROM \('([^']+)'\)")
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month):
+    return f'statements_{month:%Y_%m}'
+
+
+class StatementPartitions:
+    """Monthly range partitions of `statements` on `stored` (PostgreSQL only).
+
+    The table is converted by migration f3a5c7e9b126. The current month
+    and LRS_PARTITION_MONTHS_AHEAD months after it must always be covered,
+    by a monthly partition or by statements_legacy, whose bound can run
+    past the month the table was converted in.
+    Ingestion calls `ensure_current()`, which creates missing partitions
+    the first time it runs in a new month (cheap otherwise), and
+    `flask lrs create-partitions` does the same on demand. On SQLite or an
+    unpartitioned table everything here is a no-op.
+    """
+
+    def __init__(self):
+        self._partitioned = None
+        self._ensured_through = None
+        self._lock = threading.Lock()
+
+    @property
+    def partitioned(self):
+        if self._partitioned is None:
+            self._partitioned = db.engine.dialect.name == 'postgresql' and bool(db.session.execute(db.text(
+                "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = 'statements' AND pg_table_is_visible(c.oid)"
+            )).scalar())
+        return self._partitioned
+
+    def ensure_current(self, months_ahead):
+        month = month_start(datetime.now(timezone.utc))
+        if self._ensured_through == month or not self.partitioned:
+            return
+        with self._lock:
+            if self._ensured_through != month:
+                self.ensure(months_ahead)
+                self._ensured_through = month
+
+    def ensure(self, months_ahead):
+        """Create the partitions for this month and the next `months_ahead` months; returns the names created."""
+        if not self.partitioned:
+            return []
+        partitions = self.list()
+        created = []
+        month = month_start(datetime.now(timezone.utc))
+        # Own transaction: the DDL must not wait for, or roll back with, the caller's work
+        with db.engine.begin() as conn:
+            for _ in range(months_ahead + 1):
+                name = partition_name(month)
+                covered = any((lower is None or lower <= month) and (upper is None or month < upper)
+                              for _, lower, upper in partitions)
+                if not covered:
+                    conn.execute(db.text(
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF statements "
+                        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+                    ))
+                    created.append(name)
+                month = next_month(month)
+        if created:
+            activity_logger.info(f"Created statement partitions: {', '.join(created)}")
+        return created
+
+    def list(self):
+        """[(name, lower, upper)] for every partition, oldest first; lower is None for a MINVALUE bound."""
+        if not self.partitioned:
+            return []
+        rows = db.session.execute(db.text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'statements' AND pg_table_is_visible(p.oid)"
+        )).all()
+        partitions = []
+        for name, bound in rows:
+            upper, lower = UPPER_BOUND.search(bound), LOWER_BOUND.search(bound)
+            partitions.append((
+                name,
+                datetime.fromisoformat(lower.group(1)) if lower else None,
+                datetime.fromisoformat(upper.group(1)) if upper else None
+            ))
+        return sorted(partitions, key=lambda p: p[2] or datetime.max.replace(tzinfo=timezone.utc))
+
+    def detach(self, name, drop=True):
+        """Detach a partition (and drop it); runs in the caller's transaction."""
+        db.session.execute(db.text(f"ALTER TABLE statements DETACH PARTITION {name}"))
+        if drop:
+            db.session.execute(db.text(f"DROP TABLE {name}"))
+
+
+statement_partitions = StatementPartitions()
@@ -0,0 +1,182 @@
+from collections import Counter
+import logging
+import threading
+
+from sqlalchemy import BigInteger, Text, cast, func, tuple_
+
+from app.db import db
+from app.models.activities import Activity
+from app.models.activity_rollups import ActivityAgentRollup, ActivityRollup
+from app.models.agents import Agent
+from app.models.rollup_watermarks import RollupWatermark
+from app.models.statements import Statement
+from app.models.verbs import Verb
+
+# Import centralized loggers
+try:
+    from app import activity_logger, error_logger
+except ImportError:
+    activity_logger = logging.getLogger('activity')
+    error_logger = logging.getLogger('error')
+
+WATERMARK = 'activity_rollups'
+
+# Verbs counted by the rollups, by counter
+VERB_COUNTERS = {
+    'http://adlnet.gov/expapi/verbs/attempted': 'attempted',
+    'http://adlnet.gov/expapi/verbs/completed': 'completed',
+    'http://adlnet.gov/expapi/verbs/passed': 'passed',
+    'http://adlnet.gov/expapi/verbs/failed': 'failed',
+}
+
+
+class StatementRollups:
+    """Background thread that folds newly stored statements into the activity rollups.
+
+    Statements are consumed in (ingest_seq, id) order past a watermark.
+    ingest_seq is assigned by the database, never by a clock, so a statement
+    that commits late (a spool backlog, a slow transaction) still lands past
+    the watermark. On PostgreSQL it is the inserting transaction's id and only
+    transactions older than the snapshot's xmin, which have all ended, are
+    read: a transaction still running (including an idle one left open)
+    holds the rollups back rather than having its statements skipped.
+    Voiding a statement later does not take it back out of the rollups;
+    `flask lrs rollup --rebuild` recomputes everything from scratch.
+
+    It also keeps activities.statement_count and agents.statement_count, so
+    the ingest path never updates a hot activity row.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def ensure_started(self, app):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, args=(app,), name='statement-rollups', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, app):
+        interval = app.config['LRS_ROLLUP_INTERVAL']
+        while not self._stop.wait(interval):
+            with app.app_context():
+                try:
+                    catch_up(app.config['LRS_ROLLUP_BATCH_SIZE'])
+                except Exception as ex:
+                    db.session.rollback()
+                    error_logger.error(f"Statement rollup batch failed, will retry: {ex}")
+                finally:
+                    db.session.remove()
+
+
+def _fold(deltas, key, row):
+    delta = deltas.get(key)
+    if delta is None:
+        delta = deltas[key] = {
+            'statements': 0, 'attempted': 0, 'completed': 0, 'passed': 0, 'failed': 0, 'best_scaled': None,
+            'last_scaled': None, 'last_scored_at': None, 'first_timestamp': None, 'last_timestamp': None
+        }
+    delta['statements'] += 1
+    counter = VERB_COUNTERS.get(row.verb_id)
+    if counter:
+        delta[counter] += 1
+    timestamp = row.timestamp
+    if timestamp is not None:
+        if delta['first_timestamp'] is None or timestamp < delta['first_timestamp']:
+            delta['first_timestamp'] = timestamp
+        if delta['last_timestamp'] is None or timestamp > delta['last_timestamp']:
+            delta['last_timestamp'] = timestamp
+    score = row.result_score_scaled
+    if score is not None:
+        if delta['best_scaled'] is None or score > delta['best_scaled']:
+            delta['best_scaled'] = score
+        if delta['last_scored_at'] is None or (timestamp is not None and timestamp >= delta['last_scored_at']):
+            delta['last_scaled'], delta['last_scored_at'] = score, timestamp
+
+
+def roll_up(batch_size):
+    """Fold the next `batch_size` statements past the watermark into the rollups and commit; returns how many."""
+    watermark = RollupWatermark.lock(WATERMARK)
+    query = db.session.query(
+        Statement.id, Statement.ingest_seq, Statement.stored, Statement.timestamp, Agent.mbox.label('actor_mbox'),
+        Verb.id.label('verb_id'), Activity.id.label('object_id'), Statement.result_score_scaled, Statement.actor_key,
+        Statement.object_key
+    ).join(Verb, Verb.key == Statement.verb_key).join(Activity, Activity.key == Statement.object_key) \
+        .outerjoin(Agent, Agent.id == Statement.actor_key).filter(Statement.voided == False)
+    if db.engine.dialect.name == 'postgresql':
+        # Transactions below xmin have ended; a newer one may still commit statements
+        query = query.filter(Statement.ingest_seq < cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger))
+    if watermark.ingest_seq is not None:
+        query = query.filter(tuple_(Statement.ingest_seq, Statement.id) > (watermark.ingest_seq, watermark.statement_id))
+    rows = query.order_by(Statement.ingest_seq, Statement.id).limit(batch_size).all()
+    if not rows:
+        db.session.rollback()
+        return 0
+
+    activities, pairs = {}, {}
+    activity_counts, agent_counts = Counter(), Counter()
+    for row in rows:
+        _fold(activities, row.object_id, row)
+        activity_counts[row.object_key] += 1
+        if row.actor_mbox:
+            _fold(pairs, (row.object_id, row.actor_mbox), row)
+            agent_counts[row.actor_key] += 1
+
+    # A learner counts towards an activity the first time a pair row is created
+    seen = set(
+        db.session.query(ActivityAgentRollup.activity_id, ActivityAgentRollup.agent)
+        .filter(tuple_(ActivityAgentRollup.activity_id, ActivityAgentRollup.agent).in_(list(pairs)))
+    ) if pairs else set()
+    for activity_id, delta in activities.items():
+        delta['activity_id'] = activity_id
+        delta['learners'] = 0
+    for (activity_id, agent), delta in pairs.items():
+        delta['activity_id'], delta['agent'] = activity_id, agent
+        if (activity_id, agent) not in seen:
+            activities[activity_id]['learners'] += 1
+
+    try:
+        ActivityRollup.apply(list(activities.values()))
+        ActivityAgentRollup.apply(list(pairs.values()))
+        Activity.add_statement_counts(activity_counts)
+        Agent.add_statement_counts(agent_counts)
+        watermark.ingest_seq, watermark.statement_id = rows[-1].ingest_seq, rows[-1].id
+        watermark.stored = rows[-1].stored
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(rows)
+
+
+def catch_up(batch_size):
+    """Run `roll_up` until a batch comes back short; returns the total number of statements folded in."""
+    total = 0
+    while True:
+        folded = roll_up(batch_size)
+        total += folded
+        if folded < batch_size:
+            return total
+
+
+def reset():
+    """Empty the rollups and statement counts and rewind the watermark, so the next catch-up recomputes them."""
+    RollupWatermark.lock(WATERMARK)
+    ActivityAgentRollup.query.delete(synchronize_session=False)
+    ActivityRollup.query.delete(synchronize_session=False)
+    Activity.query.filter(Activity.statement_count != 0).update({'statement_count': 0}, synchronize_session=False)
+    Agent.query.filter(Agent.statement_count != 0).update({'statement_count': 0}, synchronize_session=False)
+    RollupWatermark.query.filter_by(name=WATERMARK).delete(synchronize_session=False)
+    db.session.commit()
+    activity_logger.info("Activity rollups reset")
+
+
+statement_rollups = StatementRollups()
@@ -0,0 +1,326 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from app.db import db
+
+# Import centralized loggers
+try:
+    from app import activity_logger, error_logger
+except ImportError:
+    activity_logger = logging.getLogger('activity')
+    error_logger = logging.getLogger('error')
+
+# Spool slots tried per directory; each worker process locks one
+MAX_SLOTS = 64
+
+
+class SpoolFull(Exception):
+    """The spool holds more undrained data than LRS_SPOOL_MAX_BYTES."""
+
+
+class SpoolFile:
+    """One append-only NDJSON spool file and the offset up to which it has been stored.
+
+    The file is locked with flock for as long as it is open, so a spool is
+    only ever appended to or drained by one process. `<name>.offset` records
+    how far the writer got; records after it are replayed on the next open.
+    """
+
+    def __init__(self, path, fd):
+        self.path = path
+        self.fd = fd
+        self.offset_path = path[:-len('.ndjson')] + '.offset'
+        self.rejected_path = path[:-len('.ndjson')] + '.rejected'
+        self.size = os.fstat(fd).st_size
+        self.offset = self._read_offset()
+        self.synced = self.size
+        self.pending_records = 0
+        self._recover()
+
+    @classmethod
+    def claim(cls, path):
+        """Open and lock `path`; returns None if another process holds it."""
+        fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return cls(path, fd)
+
+    def close(self):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+    def _read_offset(self):
+        try:
+            with open(self.offset_path) as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def write_offset(self, offset):
+        tmp = self.offset_path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.offset_path)
+        self.offset = offset
+
+    def _recover(self):
+        """Drop a torn last line (never acknowledged) and count the records still to be stored."""
+        if self.offset > self.size:
+            # Crashed between truncating the file and resetting the offset
+            self.write_offset(0)
+        if self.size and os.pread(self.fd, 1, self.size - 1) != b'\n':
+            tail = os.pread(self.fd, self.size - self.offset, self.offset)
+            self.size = self.offset + tail.rfind(b'\n') + 1
+            os.ftruncate(self.fd, self.size)
+            os.fsync(self.fd)
+            self.synced = self.size
+        self.pending_records = os.pread(self.fd, self.size - self.offset, self.offset).count(b'\n')
+
+    @property
+    def pending_bytes(self):
+        return self.size - self.offset
+
+    def read(self, max_statements):
+        """Return (records, lines, end_offset) for the records after the offset, up to about `max_statements`."""
+        records, position, statements, consumed = [], self.offset, 0, 0
+        end = self.size
+        while position < end and statements < max_statements:
+            chunk = os.pread(self.fd, min(end - position, 1024 * 1024), position)
+            if b'\n' not in chunk:
+                chunk = os.pread(self.fd, end - position, position)
+            lines = chunk[:chunk.rfind(b'\n') + 1].splitlines(keepends=True)
+            if not lines:
+                break
+            for line in lines:
+                position += len(line)
+                consumed += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    self.reject(line.decode(errors='replace'), 'undecodable spool line')
+                    error_logger.error(f"Skipped an undecodable line in {self.path}")
+                    continue
+                records.append(record)
+                statements += len(record['statements'])
+                if statements >= max_statements:
+                    break
+        return records, consumed, position
+
+    def peek_spooled_at(self):
+        """spooled_at of the oldest record not stored yet, or None."""
+        if not self.pending_bytes:
+            return None
+        line = os.pread(self.fd, min(self.pending_bytes, 64 * 1024), self.offset).split(b'\n', 1)[0]
+        try:
+            return json.loads(line)['spooled_at']
+        except (ValueError, KeyError):
+            return None
+
+    def reject(self, record, reason):
+        with open(self.rejected_path, 'a') as f:
+            f.write(json.dumps({'reason': reason, 'record': record}) + '\n')
+
+
+class StatementSpool:
+    """Local, durable write-ahead spool for xAPI statements (LRS_INGEST_MODE=spool).
+
+    Requests append validated statements to this worker's spool file and are
+    acknowledged once the append is fsynced; concurrent appends share one
+    fsync. A background thread bulk-stores spooled statements with `store`
+    and then advances the file's offset, so after a crash anything past the
+    offset is stored again (statement ids are fixed when spooled, so replays
+    are no-ops). When idle, the thread also drains spool files left behind
+    by processes that no longer run. Appends are refused with SpoolFull
+    once LRS_SPOOL_MAX_BYTES are waiting.
+    """
+
+    def __init__(self):
+        self.spool = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.appended = 0
+        self.stored = 0
+        self.rejected = 0
+        self.fsyncs = 0
+        self.failed_batches = 0
+        self.refused = 0
+        self.lag_seconds = 0.0
+
+    def ensure_started(self, app, store):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                if self.spool is None:
+                    self.spool = self._claim_slot(app.config['LRS_SPOOL_DIR'])
+                self.max_bytes = app.config['LRS_SPOOL_MAX_BYTES']
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, args=(app, store), name='statement-spool', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    @staticmethod
+    def _claim_slot(directory):
+        os.makedirs(directory, exist_ok=True)
+        for slot in range(MAX_SLOTS):
+            spool = SpoolFile.claim(os.path.join(directory, f'spool-{slot}.ndjson'))
+            if spool is not None:
+                if spool.pending_records:
+                    activity_logger.info(f"Recovering {spool.pending_records} spooled statement batches from {spool.path}")
+                return spool
+        raise RuntimeError(f'All {MAX_SLOTS} statement spool slots in {directory} are in use')
+
+    def append(self, authority, statements, ids):
+        """Durably spool a batch of validated statements and the ids acknowledged for them; raises SpoolFull under back-pressure."""
+        record = {'spooled_at': time.time(), 'authority': authority, 'statements': statements, 'ids': ids}
+        line = (json.dumps(record) + '\n').encode()
+        spool = self.spool
+        with self._write_lock:
+            if spool.pending_bytes + len(line) > self.max_bytes:
+                self.refused += 1
+                raise SpoolFull(f'{spool.pending_bytes} bytes waiting to be stored')
+            os.write(spool.fd, line)
+            spool.size += len(line)
+            spool.pending_records += 1
+            end = spool.size
+            self.appended += 1
+        with self._sync_lock:
+            if spool.synced < end:
+                target = spool.size
+                os.fsync(spool.fd)
+                spool.synced = target
+                self.fsyncs += 1
+        self._wake.set()
+
+    def _run(self, app, store):
+        interval = app.config['LRS_SPOOL_INTERVAL']
+        batch_size = app.config['LRS_SPOOL_BATCH_SIZE']
+        failures = 0
+        while not self._stop.is_set():
+            with app.app_context():
+                try:
+                    drained = self._drain(self.spool, store, batch_size)
+                    if not drained:
+                        drained = self.drain_directory(app.config['LRS_SPOOL_DIR'], store, batch_size)
+                    failures = 0
+                except (OperationalError, InterfaceError) as ex:
+                    db.session.rollback()
+                    failures += 1
+                    self.failed_batches += 1
+                    error_logger.error(f"Statement spool writer cannot reach the database, will retry: {ex}")
+                    self._stop.wait(min(30, 2 ** failures))
+                    continue
+                except Exception as ex:
+                    db.session.rollback()
+                    self.failed_batches += 1
+                    error_logger.error(f"Statement spool writer failed, will retry: {ex}")
+                    self._stop.wait(interval)
+                    continue
+                finally:
+                    db.session.remove()
+            if not drained:
+                self._wake.wait(interval)
+                self._wake.clear()
+
+    def _drain(self, spool, store, batch_size):
+        """Store the spool's pending records batch by batch; returns the number of records stored."""
+        total = 0
+        while True:
+            records, consumed, end = spool.read(batch_size)
+            if end == spool.offset:
+                return total
+            stored = records
+            try:
+                store(records)
+            except (OperationalError, InterfaceError):
+                raise
+            except Exception as ex:
+                # Something in the batch is unstorable; store one by one and set the culprits aside
+                db.session.rollback()
+                self.failed_batches += 1
+                error_logger.error(f"Statement spool batch failed, retrying records one by one: {ex}")
+                stored = list(records)
+                for record in records:
+                    try:
+                        store([record])
+                    except (OperationalError, InterfaceError):
+                        raise
+                    except Exception as record_ex:
+                        db.session.rollback()
+                        spool.reject(record, str(record_ex))
+                        stored.remove(record)
+                        self.rejected += 1
+                        error_logger.error(f"Rejected spooled statement batch, kept in {spool.rejected_path}: {record_ex}")
+            if records:
+                self.lag_seconds = time.time() - records[-1]['spooled_at']
+            with self._write_lock:
+                spool.write_offset(end)
+                spool.pending_records -= consumed
+                self.stored += len(stored)
+                if spool.offset == spool.size:
+                    # Everything is stored: start the file over
+                    os.ftruncate(spool.fd, 0)
+                    os.fsync(spool.fd)
+                    spool.size = spool.synced = 0
+                    spool.write_offset(0)
+            total += len(records)
+
+    def drain_directory(self, directory, store, batch_size):
+        """Drain every spool file in `directory` that no running process holds; returns the records stored."""
+        total = 0
+        own = self.spool.path if self.spool else None
+        for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+            path = os.path.join(directory, name)
+            if not name.endswith('.ndjson') or path == own or not os.path.getsize(path):
+                continue
+            orphan = SpoolFile.claim(path)
+            if orphan is None:
+                continue
+            try:
+                if orphan.pending_records:
+                    activity_logger.info(f"Draining {orphan.pending_records} orphaned statement batches from {path}")
+                total += self._drain(orphan, store, batch_size)
+            finally:
+                orphan.close()
+        return total
+
+    def stats(self):
+        if self.spool is None:
+            return {'running': False}
+        oldest = self.spool.peek_spooled_at()
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'path': self.spool.path,
+            'depth_records': self.spool.pending_records,
+            'depth_bytes': self.spool.pending_bytes,
+            'max_bytes': self.max_bytes,
+            'oldest_pending_seconds': round(time.time() - oldest, 3) if oldest else 0.0,
+            'last_lag_seconds': round(self.lag_seconds, 3),
+            'appended': self.appended,
+            'stored': self.stored,
+            'rejected': self.rejected,
+            'refused': self.refused,
+            'failed_batches': self.failed_batches,
+            'fsyncs': self.fsyncs
+        }
+
+
+statement_spool = StatementSpool()
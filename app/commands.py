@@ -0,0 +1,264 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+import gzip
+import os
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import Text, bindparam, cast, func, select, tuple_, type_coerce, update
+
+from app.apis.lrs import store_spooled
+from app.classes.completion_worker import drain
+from app.classes.statement_partitions import statement_partitions
+from app.classes.statement_rollups import catch_up, reset
+from app.classes.statement_spool import StatementSpool
+from app.db import db
+from app.models import LrsCounter, ScormData, ScormDocument, Statement, StatementId
+from app.models.scorm_data import compress_value
+
+
+scorm_cli = AppGroup('scorm', help='SCORM runtime maintenance commands.')
+lrs_cli = AppGroup('lrs', help='xAPI LRS maintenance commands.')
+
+
+@scorm_cli.command('issue-certificates')
+@click.option('--batch-size', default=500, show_default=True, help='Completion events applied per transaction.')
+def issue_certificates(batch_size):
+    """Apply all pending SCORM/xAPI completion events now (the background worker does this continuously)."""
+    applied = drain(batch_size)
+    click.echo(f'Applied {applied} completion events.')
+
+
+@scorm_cli.command('backfill-documents')
+@click.option('--batch-size', default=500, show_default=True, help='Learner/course pairs converted per transaction.')
+def backfill_documents(batch_size):
+    """Copy scorm_data rows into scorm_documents, one document per learner and course.
+
+    Safe to re-run: keys already present in a document are left untouched.
+    """
+    last_pair = (0, 0)
+    total_pairs = total_rows = 0
+    pair = tuple_(ScormData.user_id, ScormData.course_id)
+    while True:
+        pairs = (
+            db.session.query(ScormData.user_id, ScormData.course_id)
+            .filter(pair > last_pair)
+            .distinct()
+            .order_by(ScormData.user_id, ScormData.course_id)
+            .limit(batch_size)
+            .all()
+        )
+        if not pairs:
+            break
+        rows = (
+            db.session.query(ScormData.user_id, ScormData.course_id, ScormData.cmi_key, ScormData.cmi_value)
+            .filter(pair.in_([tuple(p) for p in pairs]))
+            .all()
+        )
+        documents = defaultdict(dict)
+        for user_id, course_id, cmi_key, cmi_value in rows:
+            documents[(user_id, course_id)][cmi_key] = cmi_value
+        ScormDocument.backfill_many(documents)
+
+        total_pairs += len(pairs)
+        total_rows += len(rows)
+        last_pair = tuple(pairs[-1])
+        click.echo(f'{total_rows} rows -> {total_pairs} documents (up to user {last_pair[0]}, course {last_pair[1]})')
+    click.echo(f'Backfill complete: {total_rows} rows converted into {total_pairs} documents.')
+
+
+@scorm_cli.command('recompress')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows or documents scanned per transaction.')
+def recompress(batch_size):
+    """Compress large CMI values written before compression was enabled, and report bytes saved."""
+    bytes_before = bytes_after = rewritten = 0
+
+    # scorm_data: read the stored text as-is (bypassing CompressedText) and
+    # write back only the values compress_value actually shrinks
+    raw_value = type_coerce(ScormData.cmi_value, db.Text)
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(ScormData.id, raw_value)
+            .filter(ScormData.id > last_id)
+            .order_by(ScormData.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        changes = []
+        for row_id, value in rows:
+            packed = compress_value(value)
+            if packed != value:
+                changes.append({'row_id': row_id, 'packed': packed})
+                bytes_before += len(value.encode('utf-8'))
+                bytes_after += len(packed)
+        if changes:
+            stmt = (
+                update(ScormData.__table__)
+                .where(ScormData.__table__.c.id == bindparam('row_id'))
+                .values(cmi_value=type_coerce(bindparam('packed'), db.Text))
+            )
+            db.session.execute(stmt, changes)
+            db.session.commit()
+        rewritten += len(changes)
+        last_id = rows[-1][0]
+
+    # scorm_documents: compress inside each document
+    last_pair = (0, 0)
+    pair = tuple_(ScormDocument.user_id, ScormDocument.course_id)
+    while True:
+        documents = ScormDocument.query.filter(pair > last_pair).order_by(
+            ScormDocument.user_id, ScormDocument.course_id).limit(batch_size).all()
+        if not documents:
+            break
+        for document in documents:
+            packed = {key: compress_value(value) for key, value in document.data.items()}
+            changed = [key for key in packed if packed[key] != document.data[key]]
+            if changed:
+                bytes_before += sum(len(document.data[key].encode('utf-8')) for key in changed)
+                bytes_after += sum(len(packed[key]) for key in changed)
+                document.data = packed
+                rewritten += len(changed)
+        db.session.commit()
+        last_pair = (documents[-1].user_id, documents[-1].course_id)
+
+    click.echo(f'Recompressed {rewritten} values: {bytes_before} -> {bytes_after} bytes '
+               f'({bytes_before - bytes_after} bytes saved).')
+
+
+@lrs_cli.command('drain-spool')
+@click.option('--batch-size', default=1000, show_default=True, help='Statements stored per transaction.')
+def drain_spool(batch_size):
+    """Store statements left in spool files that no running worker holds (e.g. after switching back to sync mode)."""
+    spool = StatementSpool()
+    stored = spool.drain_directory(current_app.config['LRS_SPOOL_DIR'], store_spooled, batch_size)
+    click.echo(f'Stored {stored} spooled statement batches, {spool.rejected} rejected.')
+
+
+@lrs_cli.command('dedup')
+@click.option('--batch-size', default=1000, show_default=True, help='Duplicate statements deleted per transaction.')
+@click.option('--dry-run', is_flag=True, help='Only count the duplicates.')
+def dedup_statements(batch_size, dry_run):
+    """Collapse duplicate statements (same raw_statement) left by client retries.
+
+    The earliest stored copy of each statement is kept. raw_statement does
+    not hold the id, so copies must also share client_id (the id the client
+    sent, or none): statements sent with distinct ids stay apart. Duplicates are
+    found in one pass by hashing raw_statement and deleted in batches, one
+    transaction each, so the job can be interrupted and re-run. Their
+    statement_ids claims go in the same transaction, so a duplicate's id can
+    be stored again.
+
+    The activity rollups and statement counts still include the deleted
+    statements: run `flask lrs rollup --rebuild` afterwards.
+    """
+    is_sqlite = db.engine.dialect.name == 'sqlite'
+    table = Statement.__table__
+    raw = table.c.raw_statement
+    key = raw if is_sqlite else func.md5(cast(raw, Text))
+    ranked = select(
+        table.c.id,
+        func.row_number().over(partition_by=(key, table.c.client_id), order_by=(table.c.stored, table.c.id)).label('copy')
+    ).where(raw.isnot(None)).subquery()
+    duplicates = select(ranked.c.id).where(ranked.c.copy > 1)
+
+    deleted = 0
+    # Stream the ids on a connection of their own so the deletes can commit batch
+    # by batch; SQLite cannot write while that read is open, so it reads them all first
+    with db.engine.connect() as conn:
+        ids = conn.execution_options(stream_results=True, yield_per=batch_size).execute(duplicates).scalars()
+        if is_sqlite:
+            ids = ids.all()
+            batches = [ids[start:start + batch_size] for start in range(0, len(ids), batch_size)]
+            conn.rollback()
+        else:
+            batches = ids.partitions()
+        for batch in batches:
+            if not dry_run:
+                live = Statement.query.filter(Statement.id.in_(batch)).filter_by(voided=False).count()
+                Statement.query.filter(Statement.id.in_(batch)).delete(synchronize_session=False)
+                StatementId.query.filter(StatementId.id.in_(batch)).delete(synchronize_session=False)
+                LrsCounter.increment(statements=-live)
+                db.session.commit()
+            deleted += len(batch)
+    click.echo(f"{'Found' if dry_run else 'Deleted'} {deleted} duplicate statements.")
+    if deleted and not dry_run:
+        click.echo('Run `flask lrs rollup --rebuild` to take them out of the activity rollups and statement counts.')
+
+
+@lrs_cli.command('reconcile-counters')
+def reconcile_counters():
+    """Recount statements, activities and agents and correct the dashboard counters (run periodically, e.g. nightly from cron)."""
+    corrections = LrsCounter.reconcile()
+    click.echo(', '.join(f'{name}: {delta:+d}' for name, delta in corrections.items()))
+
+
+@lrs_cli.command('rollup')
+@click.option('--batch-size', type=int, help='Statements folded in per transaction (default LRS_ROLLUP_BATCH_SIZE).')
+@click.option('--rebuild', is_flag=True, help='Empty the rollups first and recompute them from all statements.')
+def rollup(batch_size, rebuild):
+    """Bring the activity rollups up to date now (the background worker does this continuously)."""
+    if rebuild:
+        reset()
+    folded = catch_up(batch_size or current_app.config['LRS_ROLLUP_BATCH_SIZE'])
+    click.echo(f'Folded {folded} statements into the activity rollups.')
+
+
+@lrs_cli.command('create-partitions')
+@click.option('--months-ahead', type=int, help='Months after the current one to create (default LRS_PARTITION_MONTHS_AHEAD).')
+def create_partitions(months_ahead):
+    """Create the monthly statement partitions for this month and the months ahead (PostgreSQL)."""
+    if not statement_partitions.partitioned:
+        click.echo('statements is not partitioned; nothing to do.')
+        return
+    if months_ahead is None:
+        months_ahead = current_app.config['LRS_PARTITION_MONTHS_AHEAD']
+    created = statement_partitions.ensure(months_ahead)
+    click.echo(f"Created {len(created)} partitions{': ' + ', '.join(created) if created else '.'}")
+
+
+@lrs_cli.command('archive')
+@click.option('--before', required=True, help='Archive partitions that end on or before the start of this month (YYYY-MM).')
+@click.option('--output-dir', help='Where to write the .ndjson.gz files (default LRS_ARCHIVE_DIR).')
+@click.option('--keep-table', is_flag=True, help='Detach the partitions but do not drop them.')
+def archive_statements(before, output_dir, keep_table):
+    """Export old statement partitions to gzipped NDJSON, then detach and drop them.
+
+    Each partition is written to a temporary file and renamed once complete;
+    only then is it detached, in one transaction with the removal of its
+    statement ids and the counter update. A failed run leaves the partition
+    attached and can be repeated.
+    """
+    if not statement_partitions.partitioned:
+        raise click.ClickException('statements is not partitioned; run the partitioning migration first.')
+    cutoff = datetime.strptime(before, '%Y-%m').replace(tzinfo=timezone.utc)
+    output_dir = output_dir or current_app.config['LRS_ARCHIVE_DIR']
+    os.makedirs(output_dir, exist_ok=True)
+
+    for name, lower, upper in statement_partitions.list():
+        if upper is None or upper > cutoff:
+            continue
+        query = Statement.query.filter(Statement.stored < upper)
+        if lower is not None:
+            query = query.filter(Statement.stored >= lower)
+        path = os.path.join(output_dir, f'{name}.ndjson.gz')
+        rows = live = 0
+        with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as archive:
+            for statement in query.order_by(Statement.stored, Statement.id).yield_per(1000):
+                archive.write(statement.to_json() + '\n')
+                rows += 1
+                live += not statement.voided
+        os.replace(path + '.tmp', path)
+        db.session.rollback()
+
+        statement_partitions.detach(name, drop=not keep_table)
+        claims = StatementId.query.filter(StatementId.stored < upper)
+        if lower is not None:
+            claims = claims.filter(StatementId.stored >= lower)
+        claims.delete(synchronize_session=False)
+        LrsCounter.increment(statements=-live)
+        db.session.commit()
+        click.echo(f"Archived {name}: {rows} statements to {path}{' (table kept, detached)' if keep_table else ''}")
@@ -1,3 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+
+def dialect_insert(table):
+    """INSERT with ON CONFLICT support for the active database.
+
+    PostgreSQL in production; SQLite shares the syntax, which keeps the
+    offline benchmark/load harness runs working.
+    """
+    insert = sqlite.insert if db.engine.dialect.name == "sqlite" else postgresql.insert
+    return insert(table)
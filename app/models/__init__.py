@@ -6,12 +6,21 @@ from app.models.courses import Course
 from app.models.user_courses import UserCourse
 from app.models.enrollments import Enrollment
 from app.models.scorm_data import ScormData
+from app.models.scorm_documents import ScormDocument
+from app.models.scorm_attempts import ScormAttempt
+from app.models.statement_ids import StatementId
+from app.models.verbs import Verb
 from app.models.statements import Statement
 from app.models.activities import Activity
 from app.models.agents import Agent
+from app.models.activity_states import ActivityState
 from app.models.role import Role
 from app.models.menu_item import MenuItem
 from app.models.user_in_role import UserInRole
 from app.models.menu_in_role import MenuInRole
 from app.models.feedback import Feedback
-from app.models.visit_count import VisitCount
\ No newline at end of file
+from app.models.visit_count import VisitCount
+from app.models.completion_events import CompletionEvent
+from app.models.lrs_counters import LrsCounter
+from app.models.activity_rollups import ActivityRollup, ActivityAgentRollup
+from app.models.rollup_watermarks import RollupWatermark
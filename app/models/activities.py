@@ -1,17 +1,53 @@
 from datetime import datetime, timezone
-from app.db import db
+from sqlalchemy import bindparam, func
+from app.db import db, dialect_insert
 
 
 class Activity(db.Model):
     __tablename__ = 'activities'
     
-    id = db.Column(db.String(255), primary_key=True)
+    # Surrogate key referenced by statements.object_key; `id` is the activity IRI
+    key = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.String(255), unique=True, nullable=False)
     name = db.Column(db.String(255))
     description = db.Column(db.Text)
     type = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # Live statements about the activity, kept up to date by the rollup worker
+    statement_count = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+
+    # Prefix search in the LRS web UI (LIKE 'abc%'); listings page on the primary key
+    __table_args__ = (
+        db.Index('idx_activities_name_prefix', func.lower(name).label('name_lower'),
+                 postgresql_ops={'name_lower': 'text_pattern_ops'}).ddl_if(dialect='postgresql'),
+        db.Index('idx_activities_id_prefix', id, postgresql_ops={'id': 'text_pattern_ops'}).ddl_if(dialect='postgresql'),
+    )
 
     def save(self):
         db.session.add(self)
         db.session.commit
         return
+
+    @classmethod
+    def insert_many(cls, rows):
+        """Insert the rows whose id is not stored yet in one INSERT ... ON CONFLICT DO NOTHING; the caller commits."""
+        if not rows:
+            return 0
+        stmt = dialect_insert(cls).values(rows).on_conflict_do_nothing(index_elements=[cls.id])
+        return db.session.execute(stmt).rowcount
+
+    @classmethod
+    def keys_for(cls, activity_ids):
+        """{activity IRI: key} for the activities in `activity_ids` that are stored."""
+        if not activity_ids:
+            return {}
+        return dict(db.session.query(cls.id, cls.key).filter(cls.id.in_(activity_ids)).all())
+
+    @classmethod
+    def add_statement_counts(cls, counts):
+        """Add {key: statements} to statement_count in one executemany UPDATE; the caller commits."""
+        if not counts:
+            return
+        table = cls.__table__
+        stmt = table.update().where(table.c.key == bindparam('k')).values(statement_count=table.c.statement_count + bindparam('n'))
+        db.session.execute(stmt, [{'k': key, 'n': n} for key, n in sorted(counts.items())])
@@ -0,0 +1,97 @@
+from sqlalchemy import case
+from app.db import db, dialect_insert
+
+COUNTERS = ('statements', 'attempted', 'completed', 'passed', 'failed')
+
+
+def _greatest(current, new):
+    # GREATEST() that ignores NULLs the same way on PostgreSQL and SQLite
+    return case((new.is_(None), current), (current.is_(None), new), (new > current, new), else_=current)
+
+
+def _least(current, new):
+    return case((new.is_(None), current), (current.is_(None), new), (new < current, new), else_=current)
+
+
+class RollupColumns:
+    """Aggregates shared by the per-activity and per-(activity, agent) rollups.
+
+    Rows only ever grow: `apply()` adds counts and widens the score and time
+    ranges, so folding statements in batch by batch gives the same result as
+    one pass over all of them.
+    """
+    statements = db.Column(db.Integer, nullable=False, default=0)
+    attempted = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    passed = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    best_scaled = db.Column(db.Float)
+    last_scaled = db.Column(db.Float)
+    # Timestamp of the statement last_scaled came from
+    last_scored_at = db.Column(db.DateTime(timezone=True))
+    first_timestamp = db.Column(db.DateTime(timezone=True))
+    last_timestamp = db.Column(db.DateTime(timezone=True))
+
+    def rollup_json(self):
+        return {
+            **{name: getattr(self, name) for name in COUNTERS},
+            'best_scaled': self.best_scaled,
+            'last_scaled': self.last_scaled,
+            'first_timestamp': self.first_timestamp,
+            'last_timestamp': self.last_timestamp
+        }
+
+    @classmethod
+    def apply(cls, rows):
+        """Fold per-key deltas (key columns, counters, scores, timestamps) into the table; the caller commits."""
+        if not rows:
+            return
+        table = cls.__table__
+        stmt = dialect_insert(cls).values(rows)
+        excluded = stmt.excluded
+        set_ = {name: table.c[name] + excluded[name] for name in COUNTERS + cls.EXTRA_COUNTERS}
+        set_.update({
+            'best_scaled': _greatest(table.c.best_scaled, excluded.best_scaled),
+            'last_scaled': case(
+                (excluded.last_scored_at.is_(None), table.c.last_scaled),
+                (table.c.last_scored_at.is_(None), excluded.last_scaled),
+                (excluded.last_scored_at >= table.c.last_scored_at, excluded.last_scaled),
+                else_=table.c.last_scaled
+            ),
+            'last_scored_at': _greatest(table.c.last_scored_at, excluded.last_scored_at),
+            'first_timestamp': _least(table.c.first_timestamp, excluded.first_timestamp),
+            'last_timestamp': _greatest(table.c.last_timestamp, excluded.last_timestamp),
+        })
+        stmt = stmt.on_conflict_do_update(index_elements=list(table.primary_key.columns), set_=set_)
+        db.session.execute(stmt)
+
+
+class ActivityRollup(RollupColumns, db.Model):
+    """Completion and score totals of one activity over all learners (see app/classes/statement_rollups.py)."""
+    __tablename__ = 'activity_rollups'
+    EXTRA_COUNTERS = ('learners',)
+
+    activity_id = db.Column(db.String(255), primary_key=True)
+    # Distinct agents with at least one statement about the activity
+    learners = db.Column(db.Integer, nullable=False, default=0)
+
+    def json(self):
+        return {'activity_id': self.activity_id, 'learners': self.learners, **self.rollup_json()}
+
+    def __repr__(self):
+        return f"<ActivityRollup {self.activity_id} statements={self.statements}>"
+
+
+class ActivityAgentRollup(RollupColumns, db.Model):
+    """Completion and score totals of one learner (agent mbox) on one activity."""
+    __tablename__ = 'activity_agent_rollups'
+    EXTRA_COUNTERS = ()
+
+    activity_id = db.Column(db.String(255), primary_key=True)
+    agent = db.Column(db.String(255), primary_key=True)
+
+    def json(self):
+        return {'activity_id': self.activity_id, 'agent': self.agent, **self.rollup_json()}
+
+    def __repr__(self):
+        return f"<ActivityAgentRollup {self.activity_id} {self.agent} statements={self.statements}>"
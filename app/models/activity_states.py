@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+import hashlib
+
+from app.db import db, dialect_insert
+
+
+class ActivityState(db.Model):
+    """One xAPI State API document (e.g. Storyline's resume data).
+
+    Keyed on (agent, activityId, registration, stateId). `agent` is the
+    agent's identifier (its mbox, or a prefixed mbox_sha1sum/openid/account)
+    and `registration` is '' when the client sent none. The etag is the
+    SHA-1 of the document and is what If-Match/If-None-Match compare against.
+    """
+    __tablename__ = 'activity_states'
+
+    id = db.Column(db.Integer, primary_key=True)
+    agent = db.Column(db.String(512), nullable=False)
+    activity_id = db.Column(db.String(255), nullable=False)
+    registration = db.Column(db.String(36), nullable=False, default='')
+    state_id = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(255), nullable=False, default='application/octet-stream')
+    document = db.Column(db.LargeBinary, nullable=False)
+    etag = db.Column(db.String(40), nullable=False)
+    updated = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # Agent first: one index range scan returns every state of a learner's attempt
+        db.UniqueConstraint('agent', 'activity_id', 'registration', 'state_id', name='uq_activity_states_key'),
+    )
+
+    def json(self):
+        return {
+            'agent': self.agent,
+            'activityId': self.activity_id,
+            'registration': self.registration or None,
+            'stateId': self.state_id,
+            'contentType': self.content_type,
+            'etag': self.etag,
+            'updated': self.updated
+        }
+
+    # ----------------------
+    # Class Methods
+    # ----------------------
+    @staticmethod
+    def etag_for(document):
+        return hashlib.sha1(document).hexdigest()
+
+    @classmethod
+    def context(cls, agent, activity_id, registration):
+        """Query for every state of one agent's (activity, registration)."""
+        return cls.query.filter_by(agent=agent, activity_id=activity_id, registration=registration)
+
+    @classmethod
+    def find(cls, agent, activity_id, registration, state_id, for_update=False):
+        query = cls.context(agent, activity_id, registration).filter_by(state_id=state_id)
+        return (query.with_for_update() if for_update else query).first()
+
+    @classmethod
+    def write(cls, agent, activity_id, registration, state_id, document, content_type, existing=None, create_only=False):
+        """Store a document and return its etag; the caller commits.
+
+        With `existing` (locked by `find(..., for_update=True)`) the row is
+        updated in place. Otherwise the row is inserted; an insert racing
+        another one overwrites it, unless `create_only`, in which case None
+        is returned and nothing is written.
+        """
+        etag = cls.etag_for(document)
+        if existing is not None:
+            existing.document = document
+            existing.content_type = content_type
+            existing.etag = etag
+            existing.updated = datetime.now(timezone.utc)
+            return etag
+
+        row = {
+            'agent': agent, 'activity_id': activity_id, 'registration': registration, 'state_id': state_id,
+            'document': document, 'content_type': content_type, 'etag': etag, 'updated': datetime.now(timezone.utc)
+        }
+        stmt = dialect_insert(cls).values(row)
+        keys = [cls.agent, cls.activity_id, cls.registration, cls.state_id]
+        if create_only:
+            stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+        else:
+            stmt = stmt.on_conflict_do_update(index_elements=keys, set_={
+                key: stmt.excluded[key] for key in ('document', 'content_type', 'etag', 'updated')
+            })
+        if not db.session.execute(stmt).rowcount:
+            return None
+        return etag
+
+    def __repr__(self):
+        return f"<ActivityState {self.agent} {self.activity_id} {self.state_id}>"
@@ -1,5 +1,6 @@
 from datetime import datetime, timezone
-from app.db import db
+from sqlalchemy import bindparam, func
+from app.db import db, dialect_insert
 
 
 class Agent(db.Model):
@@ -9,8 +10,41 @@ class Agent(db.Model):
     mbox = db.Column(db.String(255), unique=True)
     name = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # Live statements by the agent, kept up to date by the rollup worker
+    statement_count = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+
+    # Prefix search in the LRS web UI (LIKE 'abc%'); listings page on the primary key
+    __table_args__ = (
+        db.Index('idx_agents_name_prefix', func.lower(name).label('name_lower'),
+                 postgresql_ops={'name_lower': 'text_pattern_ops'}).ddl_if(dialect='postgresql'),
+        db.Index('idx_agents_mbox_prefix', mbox, postgresql_ops={'mbox': 'text_pattern_ops'}).ddl_if(dialect='postgresql'),
+    )
 
     def save(self):
         db.session.add(self)
         db.session.commit()
         return
+
+    @classmethod
+    def insert_many(cls, rows):
+        """Insert the rows whose mbox is not stored yet in one INSERT ... ON CONFLICT DO NOTHING; the caller commits."""
+        if not rows:
+            return 0
+        stmt = dialect_insert(cls).values(rows).on_conflict_do_nothing(index_elements=[cls.mbox])
+        return db.session.execute(stmt).rowcount
+
+    @classmethod
+    def keys_for(cls, mboxes):
+        """{mbox: id} for the agents in `mboxes` that are stored."""
+        if not mboxes:
+            return {}
+        return dict(db.session.query(cls.mbox, cls.id).filter(cls.mbox.in_(mboxes)).all())
+
+    @classmethod
+    def add_statement_counts(cls, counts):
+        """Add {id: statements} to statement_count in one executemany UPDATE; the caller commits."""
+        if not counts:
+            return
+        table = cls.__table__
+        stmt = table.update().where(table.c.id == bindparam('k')).values(statement_count=table.c.statement_count + bindparam('n'))
+        db.session.execute(stmt, [{'k': key, 'n': n} for key, n in sorted(counts.items())])
@@ -0,0 +1,125 @@
+from datetime import datetime, timezone
+import logging
+
+from sqlalchemy import func
+from app.db import db
+from app.models.courses import Course
+from app.models.user import User
+from app.models.user_courses import UserCourse
+
+# Import centralized loggers
+try:
+    from app import activity_logger, error_logger
+except ImportError:
+    activity_logger = logging.getLogger('activity')
+    error_logger = logging.getLogger('error')
+
+
+class CompletionEvent(db.Model):
+    """A learner passing a course, queued for certificate issuance.
+
+    SCORM events carry user_id/course_id directly; xAPI events carry the actor
+    mbox and activity id and are resolved to a user and course when applied.
+    Events are added to the caller's session, so they are committed together
+    with the data that triggered them.
+    """
+    __tablename__ = 'completion_events'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    source = db.Column(db.String(10), nullable=False)
+    user_id = db.Column(db.Integer)
+    course_id = db.Column(db.Integer)
+    actor_mbox = db.Column(db.String(255))
+    activity_id = db.Column(db.String(255))
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    processed_at = db.Column(db.DateTime(timezone=True))
+
+    __table_args__ = (
+        db.Index('idx_completion_events_pending', 'id', postgresql_where=db.text('processed_at IS NULL')),
+    )
+
+    def json(self):
+        return {
+            'id': self.id,
+            'source': self.source,
+            'user_id': self.user_id,
+            'course_id': self.course_id,
+            'actor_mbox': self.actor_mbox,
+            'activity_id': self.activity_id,
+            'attempts': self.attempts,
+            'created_at': self.created_at,
+            'processed_at': self.processed_at
+        }
+
+    # ----------------------
+    # Class Methods
+    # ----------------------
+    @classmethod
+    def enqueue_scorm(cls, user_id, course_id):
+        """Queue a SCORM completion; committed with the caller's transaction."""
+        db.session.add(cls(source='scorm', user_id=user_id, course_id=course_id))
+
+    @classmethod
+    def enqueue_xapi(cls, actor_mbox, activity_id):
+        """Queue an xAPI 'passed' statement; committed with the caller's transaction."""
+        db.session.add(cls(source='xapi', actor_mbox=actor_mbox, activity_id=activity_id))
+
+    @classmethod
+    def apply_pending(cls, batch_size=500, max_attempts=10):
+        """Issue certificates for one batch of pending events and commit; returns the number of events completed.
+
+        Rows are claimed with FOR UPDATE SKIP LOCKED, so several workers can
+        drain the queue at once. Issuing a certificate twice is harmless and a
+        failed batch is rolled back untouched, so retrying is always safe.
+        xAPI events that cannot be matched to a user and course yet are retried
+        up to `max_attempts` times.
+        """
+        events = (
+            cls.query.filter(cls.processed_at.is_(None))
+            .order_by(cls.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not events:
+            return 0
+
+        unresolved = [e for e in events if e.user_id is None or e.course_id is None]
+        if unresolved:
+            emails = {e.actor_mbox.replace('mailto:', '', 1) for e in unresolved if e.actor_mbox}
+            activity_ids = {e.activity_id for e in unresolved if e.activity_id}
+            users = dict(db.session.query(func.lower(User.email), User.id)
+                         .filter(func.lower(User.email).in_([email.lower() for email in emails])).all()) if emails else {}
+            courses = dict(db.session.query(Course.xapi_activity_id, Course.id)
+                           .filter(Course.xapi_activity_id.in_(activity_ids)).all()) if activity_ids else {}
+            for event in unresolved:
+                email = (event.actor_mbox or '').replace('mailto:', '', 1).lower()
+                event.user_id = users.get(email)
+                event.course_id = courses.get(event.activity_id)
+
+        now = datetime.now(timezone.utc)
+        pairs = set()
+        completed = 0
+        for event in events:
+            if event.user_id is not None and event.course_id is not None:
+                pairs.add((event.user_id, event.course_id))
+                event.processed_at = now
+                completed += 1
+            else:
+                event.attempts += 1
+                if event.attempts >= max_attempts:
+                    error_logger.error(f"Dropping unmatched completion event {event.id}: "
+                                       f"actor={event.actor_mbox} activity={event.activity_id}")
+                    event.processed_at = now
+                else:
+                    # Leave it unresolved so a later run retries the lookup
+                    event.user_id = event.course_id = None
+
+        issued = UserCourse.issue_certificates(pairs)
+        db.session.commit()
+        activity_logger.info(f"Applied {completed} completion events, {issued} certificates issued")
+        return completed
+
+    def __repr__(self):
+        return f"<CompletionEvent id={self.id} source={self.source} user_id={self.user_id} course_id={self.course_id}>"
@@ -18,11 +18,14 @@ class Course(db.Model):
     manifest_title = db.Column(db.String)
     package_id = db.Column(db.String, nullable=False)
     launch_url = db.Column(db.String, nullable=False)
+    xapi_activity_id = db.Column(db.String(255), index=True)
+    # Embed the learner's CMI snapshot in the player page on launch (see launch_course)
+    prefetch_resume = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
 
     # created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(tz=ZoneInfo("Asia/Kolkata")))
 
-    def __init__(self, name, description,scorm_version,package_path,manifest_path,manifest_identifier, manifest_title, package_id, launch_url):
+    def __init__(self, name, description,scorm_version,package_path,manifest_path,manifest_identifier, manifest_title, package_id, launch_url, xapi_activity_id=None):
         self.name = name
         self.description = description
         self.scorm_version = scorm_version
@@ -32,6 +35,7 @@ class Course(db.Model):
         self.manifest_title = manifest_title
         self.package_id = package_id
         self.launch_url = launch_url
+        self.xapi_activity_id = xapi_activity_id
         self.created_at = datetime.now()
     
     def json(self):
@@ -45,6 +49,8 @@ class Course(db.Model):
             "manifest_title": self.manifest_title,
             "package_id": self.package_id,
             "launch_url": self.launch_url,
+            "xapi_activity_id": self.xapi_activity_id,
+            "prefetch_resume": self.prefetch_resume,
             "created_at": self.created_at
         }
 
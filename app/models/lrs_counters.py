@@ -0,0 +1,95 @@
+import logging
+import random
+
+from sqlalchemy import func
+from app.db import db, dialect_insert
+from app.models.activities import Activity
+from app.models.agents import Agent
+from app.models.statements import Statement
+
+# Import centralized loggers
+try:
+    from app import activity_logger
+except ImportError:
+    activity_logger = logging.getLogger('activity')
+
+# Each counter is spread over this many rows so concurrent ingest transactions
+# rarely wait on the same row lock; reading a counter sums its shards
+SHARDS = 16
+
+
+class LrsCounter(db.Model):
+    """Running totals for the LRS dashboard (statements, activities, agents).
+
+    Updated by the ingestion path in the same transaction as the rows it
+    counts, so reading a total is O(1) instead of a COUNT(*).
+    `flask lrs reconcile-counters` corrects any drift.
+    """
+    __tablename__ = 'lrs_counters'
+
+    name = db.Column(db.String(50), primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def json(self):
+        return {
+            'name': self.name,
+            'shard': self.shard,
+            'value': self.value
+        }
+
+    # ----------------------
+    # Class Methods
+    # ----------------------
+    @classmethod
+    def increment(cls, **deltas):
+        """Add to counters, e.g. increment(statements=30, agents=1); committed with the caller's transaction."""
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        shard = random.randrange(SHARDS)
+        stmt = dialect_insert(cls).values([
+            {'name': name, 'shard': shard, 'value': delta} for name, delta in deltas.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.name, cls.shard],
+            set_={'value': cls.__table__.c.value + stmt.excluded.value},
+        )
+        db.session.execute(stmt)
+
+    @classmethod
+    def totals(cls):
+        """{name: value} for every counter."""
+        rows = db.session.query(cls.name, func.sum(cls.value)).group_by(cls.name).all()
+        return {name: int(value) for name, value in rows}
+
+    @classmethod
+    def reconcile(cls):
+        """Recount statements (not voided), activities and agents, correct the counters and commit.
+
+        Runs in its own transactions. The true counts and the counters are
+        read in one REPEATABLE READ snapshot, and the difference is then added
+        like any other increment. Ingestion keeps running meanwhile and
+        nothing it adds is lost. Returns {name: correction applied}.
+        """
+        counts = {
+            'statements': Statement.query.filter_by(voided=False),
+            'activities': Activity.query,
+            'agents': Agent.query
+        }
+        db.session.close()
+        if db.engine.dialect.name != 'sqlite':
+            db.session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+        actual = {name: query.count() for name, query in counts.items()}
+        current = cls.totals()
+        db.session.rollback()
+
+        corrections = {name: actual[name] - (current.get(name) or 0) for name in counts}
+        cls.increment(**corrections)
+        db.session.commit()
+        if any(corrections.values()):
+            activity_logger.info(f"Reconciled LRS counters: {corrections}")
+        return corrections
+
+    def __repr__(self):
+        return f"<LrsCounter {self.name}[{self.shard}]={self.value}>"
@@ -0,0 +1,42 @@
+from app.db import db, dialect_insert
+
+
+class RollupWatermark(db.Model):
+    """How far a rollup has consumed statements, as the (ingest_seq, id) of the last one folded in.
+
+    `stored` is that statement's stored time, reported as the rollups' as-of time.
+    """
+    __tablename__ = 'rollup_watermarks'
+
+    name = db.Column(db.String(50), primary_key=True)
+    ingest_seq = db.Column(db.BigInteger)
+    stored = db.Column(db.DateTime(timezone=True))
+    statement_id = db.Column(db.String(36))
+
+    def json(self):
+        return {
+            'name': self.name,
+            'ingest_seq': self.ingest_seq,
+            'stored': self.stored,
+            'statement_id': self.statement_id
+        }
+
+    # ----------------------
+    # Class Methods
+    # ----------------------
+    @classmethod
+    def lock(cls, name):
+        """Return the watermark row, created if missing, locked until the caller's transaction ends.
+
+        Holding the lock while a batch is folded in keeps two workers from
+        consuming the same statements twice.
+        """
+        db.session.execute(dialect_insert(cls).values(name=name).on_conflict_do_nothing(index_elements=[cls.name]))
+        return cls.query.filter_by(name=name).with_for_update().one()
+
+    @classmethod
+    def get(cls, name):
+        return db.session.get(cls, name)
+
+    def __repr__(self):
+        return f"<RollupWatermark {self.name} {self.ingest_seq} {self.statement_id}>"
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from app.db import db, dialect_insert
+
+
+class ScormAttempt(db.Model):
+    """Shared record of a learner's SCORM attempt, used when SCORM_ATTEMPT_REGISTRY=database."""
+    __tablename__ = "scorm_attempts"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), primary_key=True)
+    token = db.Column(db.String(80), nullable=False)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    dirty = db.Column(db.Boolean, nullable=False, default=False)
+    started_at = db.Column(db.DateTime, default=lambda: datetime.now(tz=ZoneInfo("Asia/Kolkata")))
+    last_seen_at = db.Column(db.DateTime, default=lambda: datetime.now(tz=ZoneInfo("Asia/Kolkata")))
+    last_commit_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index("idx_scorm_attempts_active_seen", "active", "last_seen_at"),
+    )
+
+    def json(self):
+        return {
+            "user_id": self.user_id,
+            "course_id": self.course_id,
+            "token": self.token,
+            "active": self.active,
+            "dirty": self.dirty,
+            "started_at": self.started_at,
+            "last_seen_at": self.last_seen_at,
+            "last_commit_at": self.last_commit_at
+        }
+
+    # ----------------------
+    # Class Methods
+    # ----------------------
+    @classmethod
+    def start(cls, user_id, course_id, token):
+        """Create or restart the attempt for a user and course and commit."""
+        now = datetime.now(tz=ZoneInfo("Asia/Kolkata"))
+        stmt = dialect_insert(cls).values(user_id=user_id, course_id=course_id, token=token, active=True, dirty=False,
+                                          started_at=now, last_seen_at=now, last_commit_at=None)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.user_id, cls.course_id],
+            set_={"token": token, "active": True, "dirty": False, "started_at": now, "last_seen_at": now,
+                  "last_commit_at": None},
+        )
+        db.session.execute(stmt)
+        db.session.commit()
+
+    @classmethod
+    def get_active(cls, user_id, course_id, ttl):
+        """Return the attempt if it is active and was seen within `ttl` seconds, else None."""
+        cutoff = datetime.now(tz=ZoneInfo("Asia/Kolkata")) - timedelta(seconds=ttl)
+        return cls.query.filter(cls.user_id == user_id, cls.course_id == course_id,
+                                cls.active.is_(True), cls.last_seen_at >= cutoff).first()
+
+    @classmethod
+    def update_state(cls, user_id, course_id, **fields):
+        """Update attempt fields (dirty, active, last_commit_at ...) and refresh last_seen_at."""
+        fields["last_seen_at"] = datetime.now(tz=ZoneInfo("Asia/Kolkata"))
+        cls.query.filter_by(user_id=user_id, course_id=course_id).update(fields, synchronize_session=False)
+        db.session.commit()
+
+    @classmethod
+    def count_active(cls, ttl):
+        """Number of attempts that are active and were seen within `ttl` seconds."""
+        cutoff = datetime.now(tz=ZoneInfo("Asia/Kolkata")) - timedelta(seconds=ttl)
+        return cls.query.filter(cls.active.is_(True), cls.last_seen_at >= cutoff).count()
+
+    def __repr__(self):
+        return f"<ScormAttempt user_id={self.user_id} course_id={self.course_id} active={self.active}>"
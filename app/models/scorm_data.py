@@ -1,6 +1,55 @@
+import base64
 from datetime import datetime
+import threading
+import zlib
 from zoneinfo import ZoneInfo
-from app.db import db
+from sqlalchemy.types import Text, TypeDecorator
+from app.db import db, dialect_insert
+
+# Values larger than this (UTF-8 bytes) are stored zlib-compressed and
+# base85-encoded behind COMPRESSED_PREFIX; in practice this is cmi.suspend_data
+COMPRESS_MIN_BYTES = 1024
+COMPRESSED_PREFIX = "\x1bz85:"
+
+# Running totals since process start, reported by /api/lms/scorm/stats
+compression_stats = {"values_compressed": 0, "bytes_in": 0, "bytes_stored": 0}
+_stats_lock = threading.Lock()
+
+
+def compress_value(value):
+    """Encode a CMI value for storage, compressing it if it is large enough to benefit."""
+    if not isinstance(value, str) or value.startswith(COMPRESSED_PREFIX):
+        return value
+    raw = value.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return value
+    packed = COMPRESSED_PREFIX + base64.b85encode(zlib.compress(raw, 6)).decode("ascii")
+    if len(packed) >= len(raw):
+        return value
+    with _stats_lock:
+        compression_stats["values_compressed"] += 1
+        compression_stats["bytes_in"] += len(raw)
+        compression_stats["bytes_stored"] += len(packed)
+    return packed
+
+
+def decompress_value(value):
+    """Inverse of compress_value; plain values pass through unchanged."""
+    if not isinstance(value, str) or not value.startswith(COMPRESSED_PREFIX):
+        return value
+    return zlib.decompress(base64.b85decode(value[len(COMPRESSED_PREFIX):])).decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """Text column that transparently compresses large values."""
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_value(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_value(value)
 
 
 class ScormData(db.Model):
@@ -10,7 +59,7 @@ class ScormData(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), nullable=False)
     cmi_key = db.Column(db.String, nullable=False)
-    cmi_value = db.Column(db.Text)
+    cmi_value = db.Column(CompressedText)
     updated_at = db.Column(
         db.DateTime, default=lambda: datetime.now(tz=ZoneInfo("Asia/Kolkata")), onupdate=lambda: datetime.now(tz=ZoneInfo("Asia/Kolkata"))
     )
@@ -79,6 +128,39 @@ class ScormData(db.Model):
         """Get all SCORM data records for a given user and course."""
         return cls.query.filter_by(user_id=user_id, course_id=course_id).all()
 
+    @classmethod
+    def get_snapshot(cls, user_id, course_id):
+        """Return the learner's CMI data model for a course as a {cmi_key: cmi_value} dict."""
+        return {row.cmi_key: row.cmi_value for row in cls.get_by_user_course(user_id, course_id)}
+
+    @classmethod
+    def get_value(cls, user_id, course_id, cmi_key):
+        """Return one CMI value, or None if it was never set."""
+        row = cls.get_by_key(user_id, course_id, cmi_key)
+        return row.cmi_value if row else None
+
+    @classmethod
+    def upsert_many(cls, user_id, course_id, values):
+        """Insert or update several CMI keys in one INSERT ... ON CONFLICT (uq_user_course_cmi); the caller commits.
+
+        Returns the set of keys written. A key whose stored value already
+        matches is skipped by the database and left out.
+        """
+        if not values:
+            return set()
+        now = datetime.now(tz=ZoneInfo("Asia/Kolkata"))
+        stmt = dialect_insert(cls).values([
+            {"user_id": user_id, "course_id": course_id, "cmi_key": key, "cmi_value": value, "updated_at": now}
+            for key, value in values.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.user_id, cls.course_id, cls.cmi_key],
+            set_={"cmi_value": stmt.excluded.cmi_value, "updated_at": stmt.excluded.updated_at},
+            # An unchanged value is not rewritten (no new row version, no WAL)
+            where=cls.__table__.c.cmi_value.is_distinct_from(stmt.excluded.cmi_value),
+        ).returning(cls.cmi_key)
+        return set(db.session.execute(stmt).scalars())
+
     @classmethod
     def get_by_key(cls, user_id, course_id, cmi_key):
         """Get a specific SCORM data record by key."""
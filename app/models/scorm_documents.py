@@ -0,0 +1,99 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql
+from app.db import db, dialect_insert
+from app.models.scorm_data import compress_value, decompress_value
+
+
+class ScormDocument(db.Model):
+    """One JSON document holding the whole CMI data model of a learner's attempt at a course.
+
+    Alternative to the row-per-key ScormData layout, selected with SCORM_STORAGE=document.
+    """
+    __tablename__ = "scorm_documents"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), primary_key=True)
+    data = db.Column(db.JSON().with_variant(postgresql.JSONB(), "postgresql"), nullable=False, default=dict)
+    updated_at = db.Column(
+        db.DateTime, default=lambda: datetime.now(tz=ZoneInfo("Asia/Kolkata")), onupdate=lambda: datetime.now(tz=ZoneInfo("Asia/Kolkata"))
+    )
+
+    def __init__(self, user_id, course_id, data=None):
+        self.user_id = user_id
+        self.course_id = course_id
+        self.data = data or {}
+        self.updated_at = datetime.now(tz=ZoneInfo("Asia/Kolkata"))
+
+    def json(self):
+        return {
+            "user_id": self.user_id,
+            "course_id": self.course_id,
+            "data": {key: decompress_value(value) for key, value in (self.data or {}).items()},
+            "updated_at": self.updated_at
+        }
+
+    # ----------------------
+    # Class Methods
+    # ----------------------
+    @classmethod
+    def get_snapshot(cls, user_id, course_id):
+        """Return the learner's CMI data model for a course as a dict (single-row fetch)."""
+        document = db.session.get(cls, (user_id, course_id))
+        return {key: decompress_value(value) for key, value in document.data.items()} if document else {}
+
+    @classmethod
+    def get_value(cls, user_id, course_id, cmi_key):
+        """Return one CMI value, or None if it was never set."""
+        return cls.get_snapshot(user_id, course_id).get(cmi_key)
+
+    @classmethod
+    def upsert_many(cls, user_id, course_id, values):
+        """Set several CMI keys in place, leaving the rest of the document untouched; the caller commits.
+
+        Returns the set of keys written: all of them when the document
+        changed, none when it already held these values and was left alone.
+        """
+        if not values:
+            return set()
+        written = db.session.execute(cls._merge_statement([(user_id, course_id, values)], prefer_existing=False)).rowcount
+        return set(values) if written else set()
+
+    @classmethod
+    def backfill_many(cls, documents):
+        """Merge {(user_id, course_id): {cmi_key: value}} into documents without overwriting keys already there."""
+        if not documents:
+            return
+        rows = [(user_id, course_id, values) for (user_id, course_id), values in documents.items()]
+        db.session.execute(cls._merge_statement(rows, prefer_existing=True))
+        db.session.commit()
+
+    @classmethod
+    def _merge_statement(cls, rows, prefer_existing):
+        """INSERT ... ON CONFLICT that merges top-level keys into the stored document.
+
+        On PostgreSQL this is `data || excluded.data`, i.e. a partial key update
+        done by the database; SQLite gets the equivalent json_patch(). A
+        document the merge would not change is not rewritten.
+        """
+        now = datetime.now(tz=ZoneInfo("Asia/Kolkata"))
+        is_sqlite = db.engine.dialect.name == "sqlite"
+        stmt = dialect_insert(cls).values([
+            {"user_id": user_id, "course_id": course_id, "updated_at": now,
+             "data": {key: compress_value(value) for key, value in values.items()}}
+            for user_id, course_id, values in rows
+        ])
+        old, new = cls.__table__.c.data, stmt.excluded.data
+        base, patch = (new, old) if prefer_existing else (old, new)
+        merged = func.json_patch(base, patch) if is_sqlite else base.op("||")(patch)
+        # json_patch() returns minified text, so compare it with the minified stored document
+        current = func.json(old) if is_sqlite else old
+        return stmt.on_conflict_do_update(
+            index_elements=[cls.user_id, cls.course_id],
+            set_={"data": merged, "updated_at": stmt.excluded.updated_at},
+            where=current.is_distinct_from(merged),
+        )
+
+    def __repr__(self):
+        return f"<ScormDocument user_id={self.user_id} course_id={self.course_id} keys={len(self.data or {})}>"
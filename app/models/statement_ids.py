@@ -0,0 +1,44 @@
+from app.db import db, dialect_insert
+
+
+class StatementId(db.Model):
+    """Every statement id the LRS has accepted, with the statement's `stored` time.
+
+    Once statements is partitioned by month on `stored`, its primary key has
+    to be (id, stored), so it can no longer reject a retried statement id by
+    itself. Ids are claimed here first instead. The stored time also lets a
+    lookup by id go straight to the right partition.
+    """
+    __tablename__ = 'statement_ids'
+
+    id = db.Column(db.String(36), primary_key=True)
+    stored = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # flask lrs archive drops the ids of a whole month at once
+        db.Index('idx_statement_ids_stored', 'stored'),
+    )
+
+    def json(self):
+        return {
+            'id': self.id,
+            'stored': self.stored
+        }
+
+    # ----------------------
+    # Class Methods
+    # ----------------------
+    @classmethod
+    def claim(cls, rows):
+        """INSERT ... ON CONFLICT DO NOTHING the (id, stored) rows; returns the set of ids that were new."""
+        if not rows:
+            return set()
+        stmt = dialect_insert(cls).values(rows).on_conflict_do_nothing(index_elements=[cls.id]).returning(cls.id)
+        return set(db.session.execute(stmt).scalars())
+
+    @classmethod
+    def get_stored(cls, statement_id):
+        return db.session.query(cls.stored).filter(cls.id == statement_id).scalar()
+
+    def __repr__(self):
+        return f"<StatementId {self.id} stored={self.stored}>"
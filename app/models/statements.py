@@ -2,18 +2,96 @@ from datetime import datetime, timezone
 import uuid
 
 from flask import json
-from app.db import db
+from sqlalchemy import DDL, cast, event, literal
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import Boolean, Text, TypeDecorator
+from app.db import db, dialect_insert
+from app.models.statement_ids import StatementId
+
+# Faster JSON encoder when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Rows per INSERT, keeps large batches under the driver's bind parameter limit
+INSERT_CHUNK_SIZE = 1000
+
+# Set by the LRS rather than the client: kept out of raw_statement and added by to_json()
+LRS_FIELDS = ('id', 'stored', 'authority')
+
+
+def dumps(value):
+    """JSON-encode `value`, with orjson when it is installed.
+
+    orjson rejects what it cannot encode natively, such as integers beyond
+    64 bits, which are still valid JSON; those go through flask's encoder.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value).decode()
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(value)
+
+
+class JSONText(TypeDecorator):
+    """JSON document that stays JSON text on the Python side: JSONB on PostgreSQL, Text elsewhere.
+
+    Values are written as already-encoded JSON (PostgreSQL casts the text to
+    jsonb) and read back as the text PostgreSQL renders, so documents are
+    never decoded into Python objects on the way in or out.
+    """
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.JSONB())
+        return dialect.type_descriptor(Text())
+
+    def bind_processor(self, dialect):
+        return None
+
+    def result_processor(self, dialect, coltype):
+        return None
+
+    def column_expression(self, column):
+        return cast(column, Text)
+
+
+class json_has_key(FunctionElement):
+    """Whether a JSON document has a top-level key: `?` on PostgreSQL, json_type() on SQLite."""
+    type = Boolean()
+    inherit_cache = True
+
+
+@compiles(json_has_key)
+def _json_has_key(element, compiler, **kw):
+    document, key = element.clauses
+    return f"(json_type({compiler.process(document, **kw)}, '$.' || {compiler.process(key, **kw)}) IS NOT NULL)"
+
+
+@compiles(json_has_key, 'postgresql')
+def _json_has_key_postgresql(element, compiler, **kw):
+    document, key = element.clauses
+    return f"({compiler.process(document, **kw)} ? {compiler.process(key, **kw)})"
 
 
 class Statement(db.Model):
     __tablename__ = 'statements'
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    actor_mbox = db.Column(db.String(255))
-    actor_name = db.Column(db.String(255))
-    verb_id = db.Column(db.String(255), nullable=False)
-    verb_display = db.Column(db.String(255))
-    object_id = db.Column(db.String(255), nullable=False)
+    # The id the client sent, NULL when the LRS generated one; `flask lrs dedup`
+    # only merges statements with the same body and the same client_id
+    client_id = db.Column(db.String(255))
+    # Integer keys into agents, verbs and activities instead of the repeated
+    # mbox and IRI strings; actor_key is NULL for actors without an mbox
+    actor_key = db.Column(db.Integer, db.ForeignKey('agents.id'))
+    verb_key = db.Column(db.Integer, db.ForeignKey('verbs.key'), nullable=False)
+    object_key = db.Column(db.Integer, db.ForeignKey('activities.key'), nullable=False)
     object_definition = db.Column(db.Text)
     result_completion = db.Column(db.Boolean)
     result_success = db.Column(db.Boolean)
@@ -24,25 +102,51 @@ class Statement(db.Model):
     context_instructor = db.Column(db.String(255))
     context_team = db.Column(db.String(255))
     timestamp = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
-    stored = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    # Partition key on PostgreSQL (monthly ranges, see app/classes/statement_partitions.py)
+    stored = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
     authority = db.Column(db.String(255))
     version = db.Column(db.String(10), default='1.0.3')
     voided = db.Column(db.Boolean, default=False)
-    raw_statement = db.Column(db.Text)
+    # JSONB on PostgreSQL, GIN-indexed for GET /statements/search containment filters
+    raw_statement = db.Column(JSONText)
+    # Whether the client sent a timestamp and version; to_json() adds the LRS's otherwise
+    raw_has_timestamp = db.column_property(json_has_key(raw_statement, literal('timestamp')))
+    raw_has_version = db.column_property(json_has_key(raw_statement, literal('version')))
+    # Ingest order for the rollup worker, assigned by the database: the inserting
+    # transaction's id on PostgreSQL, a trigger-kept counter on SQLite
+    ingest_seq = db.Column(db.BigInteger, nullable=False, server_default='0')
+
+    # Loaded only when asked for (e.g. joinedload in the HTML views); the
+    # API serves raw_statement and never touches them
+    actor = db.relationship('Agent')
+    verb = db.relationship('Verb')
+    activity = db.relationship('Activity')
+
+    # GET /statements filters live statements by actor, verb, object or a stored
+    # range and pages them ORDER BY stored DESC, id DESC; the (..., stored, id)
+    # indexes are read backwards for that order. Voided statements are never listed.
+    __table_args__ = (
+        db.Index('idx_statements_live_stored', 'stored', 'id', postgresql_where=db.text('voided = false')),
+        db.Index('idx_statements_live_actor', 'actor_key', 'stored', 'id', postgresql_where=db.text('voided = false')),
+        db.Index('idx_statements_live_verb', 'verb_key', 'stored', 'id', postgresql_where=db.text('voided = false')),
+        db.Index('idx_statements_live_object', 'object_key', 'stored', 'id', postgresql_where=db.text('voided = false')),
+        db.Index('idx_statements_live_raw', 'raw_statement', postgresql_using='gin',
+                 postgresql_ops={'raw_statement': 'jsonb_path_ops'},
+                 postgresql_where=db.text('voided = false')).ddl_if(dialect='postgresql'),
+        # The rollup worker reads statements in (ingest_seq, id) order past its watermark
+        db.Index('idx_statements_ingest_seq', 'ingest_seq', 'id'),
+    )
     
     def to_dict(self):
         return {
             'id': self.id,
             'actor': {
-                'mbox': self.actor_mbox,
-                'name': self.actor_name
-            },
-            'verb': {
-                'id': self.verb_id,
-                'display': {'en-US': self.verb_display}
-            },
+                'mbox': self.actor.mbox,
+                'name': self.actor.name
+            } if self.actor else None,
+            'verb': self.verb.json(),
             'object': {
-                'id': self.object_id,
+                'id': self.activity.id,
                 'definition': json.loads(self.object_definition) if self.object_definition else None
             },
             'result': {
@@ -66,7 +170,58 @@ class Statement(db.Model):
             'voided': self.voided
         }
     
+    def to_json(self):
+        """The statement as JSON text: the stored raw document with the fields the LRS sets added.
+
+        raw_statement is passed through as text (on PostgreSQL, the jsonb
+        rendered by the database) instead of being decoded and re-encoded in
+        Python. id, stored and authority are always appended (raw_statement
+        never holds them; migration 9c1e3b5d7f80 stripped them from older
+        rows), and timestamp and version when the client left them out.
+        """
+        if not self.raw_statement:
+            return dumps(self.to_dict())
+        raw = self.raw_statement.rstrip()[:-1].rstrip()
+        separator = '' if raw.endswith('{') else ','
+        stored = self.stored.isoformat() if self.stored else None
+        added = f'"id":{dumps(self.id)},"stored":{dumps(stored)},"authority":{dumps(self.authority)}'
+        if not self.raw_has_timestamp:
+            timestamp = self.timestamp.isoformat() if self.timestamp else stored
+            added += f',"timestamp":{dumps(timestamp)}'
+        if not self.raw_has_version:
+            added += f',"version":{dumps(self.version)}'
+        return f'{raw}{separator}{added}}}'
+
     def save(self):
         db.session.add(self)
         db.session.commit()
-        return 
\ No newline at end of file
+        return
+
+    @classmethod
+    def insert_many(cls, rows):
+        """Bulk insert statements whose id is new; the caller commits. Returns the number of rows inserted.
+
+        Ids are claimed in statement_ids with INSERT ... ON CONFLICT DO NOTHING
+        first, because the partitioned statements table cannot enforce a
+        unique id on its own; statements already stored are skipped.
+        """
+        inserted = 0
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            chunk = rows[start:start + INSERT_CHUNK_SIZE]
+            claimed = StatementId.claim([{'id': row['id'], 'stored': row['stored']} for row in chunk])
+            chunk = [row for row in chunk if row['id'] in claimed]
+            if chunk:
+                stmt = dialect_insert(cls).values(chunk).on_conflict_do_nothing()
+                inserted += db.session.execute(stmt).rowcount
+        return inserted
+
+
+# How the database assigns ingest_seq; the same DDL is in migration c3e5a7b9d1f2
+INGEST_SEQ_DEFAULT = "ALTER TABLE statements ALTER COLUMN ingest_seq SET DEFAULT (pg_current_xact_id()::text::bigint)"
+INGEST_SEQ_TRIGGER = """
+    CREATE TRIGGER statements_ingest_seq AFTER INSERT ON statements BEGIN
+        UPDATE statements SET ingest_seq = (SELECT max(ingest_seq) FROM statements) + 1 WHERE rowid = NEW.rowid;
+    END
+"""
+event.listen(Statement.__table__, 'after_create', DDL(INGEST_SEQ_DEFAULT).execute_if(dialect='postgresql'))
+event.listen(Statement.__table__, 'after_create', DDL(INGEST_SEQ_TRIGGER).execute_if(dialect='sqlite'))
@@ -1,6 +1,6 @@
 from collections import defaultdict
 from datetime import datetime
-from sqlalchemy import case, desc, func
+from sqlalchemy import case, desc, func, tuple_, update
 from app.db import db
 import logging
 
@@ -93,6 +93,23 @@ class UserCourse(db.Model):
             # Optionally handle the case where no user_course record exists
             return None
 
+    @classmethod
+    def issue_certificates(cls, pairs):
+        """Mark certificates issued for many (user_id, course_id) pairs in one UPDATE; caller commits.
+
+        Returns the number of rows that changed.
+        """
+        if not pairs:
+            return 0
+        stmt = (
+            update(cls)
+            .where(tuple_(cls.user_id, cls.course_id).in_(list(pairs)))
+            .where(cls.certificate_issued.isnot(True))
+            .values(certificate_issued=True)
+            .execution_options(synchronize_session=False)
+        )
+        return db.session.execute(stmt).rowcount
+
     def update_db(self, data):
         try:
             for key, value in data.items():
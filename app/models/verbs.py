@@ -0,0 +1,37 @@
+from app.db import db, dialect_insert
+
+
+class Verb(db.Model):
+    """xAPI verbs, so statements can store a small integer key instead of the verb IRI."""
+    __tablename__ = 'verbs'
+
+    key = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.String(255), unique=True, nullable=False)
+    display = db.Column(db.String(255))
+
+    def json(self):
+        return {
+            'id': self.id,
+            'display': {'en-US': self.display} if self.display else None
+        }
+
+    # ----------------------
+    # Class Methods
+    # ----------------------
+    @classmethod
+    def insert_many(cls, rows):
+        """Insert the rows whose id is not stored yet in one INSERT ... ON CONFLICT DO NOTHING; the caller commits."""
+        if not rows:
+            return 0
+        stmt = dialect_insert(cls).values(rows).on_conflict_do_nothing(index_elements=[cls.id])
+        return db.session.execute(stmt).rowcount
+
+    @classmethod
+    def keys_for(cls, verb_ids):
+        """{verb IRI: key} for the verbs in `verb_ids` that are stored."""
+        if not verb_ids:
+            return {}
+        return dict(db.session.query(cls.id, cls.key).filter(cls.id.in_(verb_ids)).all())
+
+    def __repr__(self):
+        return f"<Verb {self.key} {self.id}>"
@@ -9,6 +9,7 @@ import uuid
 from flask import Blueprint, Response, current_app, flash, json, jsonify, redirect, render_template, request, send_from_directory, session, url_for
 from flask_login import current_user, login_required
 from werkzeug.utils import secure_filename 
+from app.apis.lms import attempts, cmi_store
 from app.db import db
 from app.classes.SCORMparser import SCORMParser
 from app.classes.forms import ProfileForm, UploadForm, FeedbackForm
@@ -277,7 +278,8 @@ def upload():
                         manifest_identifier=parser.manifest_identifier,
                         manifest_title=parser.manifest_title,
                         package_id=parser.package_id,
-                        launch_url=parser.launch_url)
+                        launch_url=parser.launch_url,
+                        xapi_activity_id=parser.xapi_activity_id)
                     if parser.duplicate_package_path:
                         course.update()
                         shutil.rmtree(parser.duplicate_package_path)
@@ -331,8 +333,19 @@ def launch_course(course_id):
         user_course = UserCourse(user_id=user.id, course_id=course.id, certificate_issued=False)
         user_course.save()
     query_string = get_lrs_query_string(user, base_url)
+
+    # Opt-in resume prefetch: start the attempt here and hand the snapshot to
+    # the player so a resumed course needs no initialize/get_value round trip
+    prefetch = None
+    if course.prefetch_resume:
+        snapshot = cmi_store().get_snapshot(user.id, course.id)
+        if len(json.dumps(snapshot)) <= current_app.config['SCORM_PREFETCH_MAX_BYTES']:
+            attempt = attempts.start(user.id, course.id)
+            prefetch = {'data': snapshot, 'attempt': attempt.token}
            
-    return render_template('lms/player.html', course=course, course_id = course.id, query_string=query_string)
+    return render_template('lms/player.html', course=course, course_id = course.id, query_string=query_string, prefetch=prefetch,
+                           buffer_max_items=current_app.config['SCORM_BUFFER_MAX_ITEMS'],
+                           buffer_max_seconds=current_app.config['SCORM_BUFFER_MAX_SECONDS'])
 
 @blp.route('/scorm/<int:course_id>/<path:filename>')
 @login_required
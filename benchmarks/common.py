@@ -0,0 +1,73 @@
+"""Shared helpers for the benchmark scripts.
+
+Every benchmark runs against the database in DATABASE_URL (see .env), seeds
+its own throw-away users/courses and removes them again when it is done.
+"""
+import statistics
+import time
+import uuid
+
+from app import create_app
+from app.db import db
+from app.models import CompletionEvent, Course, ScormAttempt, ScormData, ScormDocument, User, UserCourse
+
+
+def make_app(create_tables=False):
+    app = create_app()
+    if create_tables:
+        with app.app_context():
+            db.create_all()
+    return app
+
+
+def seed_learners(count):
+    """Create one throw-away course and `count` learners enrolled on it. Returns (course_id, [user_ids])."""
+    tag = uuid.uuid4().hex[:8]
+    course = Course(
+        name=f"bench-{tag}", description="benchmark course", scorm_version="1.2",
+        package_path="app/static/scorm_packages/bench", manifest_path="imsmanifest.xml",
+        manifest_identifier=f"bench-{tag}", manifest_title="bench", package_id=tag, launch_url="index_lms.html"
+    )
+    db.session.add(course)
+    users = [User(name=f"bench {i}", email=f"bench-{tag}-{i}@example.invalid", password="x") for i in range(count)]
+    db.session.add_all(users)
+    db.session.commit()
+    db.session.add_all([UserCourse(user_id=user.id, course_id=course.id, certificate_issued=False) for user in users])
+    db.session.commit()
+    return course.id, [user.id for user in users]
+
+
+def cleanup_learners(course_id, user_ids):
+    for model in (ScormData, ScormDocument, ScormAttempt, CompletionEvent):
+        model.query.filter(model.course_id == course_id).delete(synchronize_session=False)
+    UserCourse.query.filter(UserCourse.course_id == course_id).delete(synchronize_session=False)
+    User.query.filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+    Course.query.filter(Course.id == course_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarise(name, latencies, elapsed, errors=0):
+    """Print one result line; latencies are in seconds."""
+    ms = [sample * 1000 for sample in latencies]
+    print(
+        f"{name:<24} ops={len(ms):>7} errors={errors:>5} ops/s={len(ms) / elapsed if elapsed else 0:>9.1f} "
+        f"mean={statistics.fmean(ms) if ms else 0:>7.2f}ms p50={percentile(ms, 50):>7.2f}ms "
+        f"p95={percentile(ms, 95):>7.2f}ms p99={percentile(ms, 99):>7.2f}ms"
+    )
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,157 @@
+"""Check that every GET /api/lrs/statements filter combination is served by an index.
+
+Seeds a few million synthetic statements into the PostgreSQL database in
+DATABASE_URL (plus the verbs, activities and agents they reference, each
+in one INSERT ... SELECT generate_series), ANALYZEs the table,
+then EXPLAINs the exact query app.apis.lrs builds for each documented
+filter combination, first page and a deep cursor page. A plan that reads
+statements with a sequential scan, or without any index, fails the check
+and the script exits non-zero. The seeded rows are removed afterwards
+unless --keep is given.
+
+    DATABASE_URL=postgresql://localhost/esaksham_bench python -m benchmarks.lrs_explain --rows 3000000
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+import os
+import sys
+import uuid
+
+from app.apis.lrs import _encode_cursor, _filter_statements, _page_query
+from app.db import db
+from app.models.activities import Activity
+from app.models.agents import Agent
+from app.models.statements import Statement
+from benchmarks.common import Timer, make_app
+
+PAGE = 100
+
+# (name, filter args, read a deep page)
+COMBINATIONS = [
+    ('no filter', {}, False),
+    ('no filter, deep page', {}, True),
+    ('agent', {'agent': '{agent}'}, False),
+    ('agent, deep page', {'agent': '{agent}'}, True),
+    ('verb', {'verb': '{verb}'}, False),
+    ('activity', {'activity': '{activity}'}, False),
+    ('agent + verb', {'agent': '{agent}', 'verb': '{verb}'}, False),
+    ('agent + activity', {'agent': '{agent}', 'activity': '{activity}'}, False),
+    ('verb + activity', {'verb': '{verb}', 'activity': '{activity}'}, False),
+    ('since + until', {'since': '{since}', 'until': '{until}'}, False),
+    ('agent + since', {'agent': '{agent}', 'since': '{since}'}, False),
+]
+
+SEED_SQL = [
+    """
+INSERT INTO verbs (id, display)
+SELECT 'http://adlnet.gov/expapi/verbs/explain-' || g, 'verb ' || g FROM generate_series(0, :verbs - 1) AS g
+ON CONFLICT (id) DO NOTHING
+""",
+    """
+INSERT INTO activities (id, name)
+SELECT 'http://explain.invalid/' || :tag || '/activity-' || g, 'activity ' || g FROM generate_series(0, :activities - 1) AS g
+""",
+    """
+INSERT INTO agents (mbox, name)
+SELECT 'mailto:explain-' || :tag || '-' || g || '@example.invalid', 'learner ' || g FROM generate_series(0, :agents - 1) AS g
+""",
+    # Keys of the rows just added, in generate_series order
+    """
+INSERT INTO statements (id, actor_key, verb_key, object_key, timestamp, stored, authority, version, voided)
+SELECT md5(:tag || g)::uuid::text,
+       ag.first + g % :agents,
+       v.first + g % :verbs,
+       ac.first + g % :activities,
+       now() - make_interval(secs => g * 10),
+       now() - make_interval(secs => g * 10 - 1),
+       'explain-' || :tag, '1.0.3', g % 100 = 0
+FROM generate_series(1, :rows) AS g,
+     (SELECT min(id) AS first FROM agents WHERE mbox LIKE 'mailto:explain-' || :tag || '-%') ag,
+     (SELECT min(key) AS first FROM verbs WHERE id LIKE 'http://adlnet.gov/expapi/verbs/explain-%') v,
+     (SELECT min(key) AS first FROM activities WHERE id LIKE 'http://explain.invalid/' || :tag || '/%') ac
+""",
+]
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def explain(query):
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    result = db.session.connection().exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params)
+    return result.scalar()[0]['Plan']
+
+
+def check(name, plan):
+    nodes = [node for node in plan_nodes(plan) if node.get('Relation Name') == 'statements' or 'Index Name' in node]
+    seq_scans = [node for node in nodes if node['Node Type'] == 'Seq Scan']
+    indexes = sorted({node['Index Name'] for node in nodes if 'Index Name' in node})
+    ok = not seq_scans and bool(indexes)
+    print(f"{'ok  ' if ok else 'FAIL'} {name:<24} cost={plan['Total Cost']:>12.1f} "
+          f"{'indexes: ' + ', '.join(indexes) if indexes else 'no index used'}"
+          f"{' (seq scan on statements)' if seq_scans else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN checks for the LRS statement indexes')
+    parser.add_argument('--rows', type=int, default=3_000_000, help='statements to seed')
+    parser.add_argument('--agents', type=int, default=20_000)
+    parser.add_argument('--verbs', type=int, default=40)
+    parser.add_argument('--activities', type=int, default=2_000)
+    parser.add_argument('--keep', action='store_true', help='leave the seeded statements in place')
+    args = parser.parse_args()
+
+    if not os.getenv('DATABASE_URL', '').startswith('postgresql'):
+        sys.exit('lrs_explain needs a PostgreSQL DATABASE_URL (the indexes are partial PostgreSQL indexes)')
+    app = make_app()
+    tag = uuid.uuid4().hex[:8]
+
+    with app.app_context():
+        with Timer() as t:
+            params = {'tag': tag, 'rows': args.rows, 'agents': args.agents, 'verbs': args.verbs,
+                      'activities': args.activities}
+            for sql in SEED_SQL:
+                db.session.execute(db.text(sql), params)
+            db.session.commit()
+        print(f'seeded {args.rows} statements in {t.elapsed:.1f}s')
+        db.session.execute(db.text('ANALYZE statements'))
+        db.session.commit()
+
+        now = datetime.now(timezone.utc)
+        values = {
+            'agent': f'mailto:explain-{tag}-7@example.invalid',
+            'verb': 'http://adlnet.gov/expapi/verbs/explain-3',
+            'activity': f'http://explain.invalid/{tag}/activity-11',
+            # One day, a month back
+            'since': (now - timedelta(days=31)).isoformat(),
+            'until': (now - timedelta(days=30)).isoformat(),
+        }
+        # A cursor half way down the table stands in for a deep page
+        middle = Statement.query.filter(Statement.authority == f'explain-{tag}') \
+            .order_by(Statement.stored.desc()).offset(args.rows // 2).first()
+        deep_cursor = _encode_cursor(middle)
+
+        failures = 0
+        try:
+            for name, filters, deep in COMBINATIONS:
+                query = _filter_statements({key: value.format(**values) for key, value in filters.items()})
+                query = _page_query(query, PAGE, deep_cursor if deep else None)
+                failures += not check(name, explain(query))
+        finally:
+            db.session.rollback()
+            if not args.keep:
+                Statement.query.filter(Statement.authority == f'explain-{tag}').delete(synchronize_session=False)
+                Activity.query.filter(Activity.id.like(f'http://explain.invalid/{tag}/%')).delete(synchronize_session=False)
+                Agent.query.filter(Agent.mbox.like(f'mailto:explain-{tag}-%')).delete(synchronize_session=False)
+                db.session.commit()
+
+    print(f'{len(COMBINATIONS) - failures}/{len(COMBINATIONS)} filter combinations use an index')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Compare per-statement PUT /api/lrs/statements with batched POST ingestion.
+
+Simulates Storyline/Rise bursts: every "slide" produces --burst statements,
+sent either one PUT at a time (one commit per statement plus the activity
+and agent lookups) or as one POST array (one transaction of bulk inserts).
+With no DATABASE_URL it uses a scratch SQLite file.
+
+    python -m benchmarks.lrs_ingest --slides 200 --burst 30 --concurrency 8
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import tempfile
+import threading
+import uuid
+
+from sqlalchemy import event
+
+from app.db import db
+from app.models.activities import Activity
+from app.models.agents import Agent
+from app.models.statements import Statement
+from benchmarks.common import Timer, make_app, summarise
+
+VERBS = ('http://adlnet.gov/expapi/verbs/experienced', 'http://adlnet.gov/expapi/verbs/answered',
+         'http://adlnet.gov/expapi/verbs/attempted')
+
+
+def make_burst(tag, slide, burst, learners):
+    mbox = f'mailto:bench-{tag}-{slide % learners}@example.invalid'
+    return [{
+        'id': str(uuid.uuid4()),
+        'actor': {'mbox': mbox, 'name': f'bench {slide % learners}'},
+        'verb': {'id': VERBS[i % len(VERBS)], 'display': {'en-US': 'bench'}},
+        'object': {'id': f'http://bench.invalid/{tag}/slide-{slide % 20}/item-{i}',
+                   'definition': {'name': {'en-US': f'item {i}'}, 'type': 'http://adlnet.gov/expapi/activities/interaction'}},
+        'result': {'completion': True, 'score': {'raw': i, 'min': 0, 'max': burst}},
+        'timestamp': '2025-01-01T00:00:00Z'
+    } for i in range(burst)]
+
+
+def cleanup(tag):
+    Statement.query.filter(Statement.authority == f'bench-{tag}').delete(synchronize_session=False)
+    Activity.query.filter(Activity.id.like(f'http://bench.invalid/{tag}/%')).delete(synchronize_session=False)
+    Agent.query.filter(Agent.mbox.like(f'mailto:bench-{tag}-%')).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def run(app, mode, args):
+    tag = uuid.uuid4().hex[:8]
+    auth = (f'bench-{tag}', 'bench')
+    latencies, errors, lock = [], [0], threading.Lock()
+
+    def send_slide(slide):
+        client = app.test_client()
+        statements = make_burst(tag, slide, args.burst, args.learners)
+        with Timer() as t:
+            if mode == 'put':
+                failed = sum(client.put(f"/api/lrs/statements?statementId={s['id']}", json=s, auth=auth).status_code != 200
+                             for s in statements)
+            else:
+                failed = client.post('/api/lrs/statements', json=statements, auth=auth).status_code != 200
+        with lock:
+            latencies.append(t.elapsed)
+            errors[0] += failed
+
+    with app.app_context():
+        commits = [0]
+        count_commit = lambda conn: commits.__setitem__(0, commits[0] + 1)
+        event.listen(db.engine, 'commit', count_commit)
+    with Timer() as total:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for future in [pool.submit(send_slide, slide) for slide in range(args.slides)]:
+                future.result()
+    with app.app_context():
+        event.remove(db.engine, 'commit', count_commit)
+        stored = Statement.query.filter(Statement.authority == f'bench-{tag}').count()
+        cleanup(tag)
+
+    summarise(f'{mode} (per slide)', latencies, total.elapsed, errors[0])
+    print(f'{"":<24} {stored} statements stored, {stored / total.elapsed:.1f} statements/s, '
+          f'{commits[0]} DB commits')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LRS statement ingestion benchmark')
+    parser.add_argument('--slides', type=int, default=100, help='number of statement bursts')
+    parser.add_argument('--burst', type=int, default=30, help='statements per burst')
+    parser.add_argument('--learners', type=int, default=20, help='distinct actors')
+    parser.add_argument('--concurrency', type=int, default=8, help='bursts sent at the same time')
+    parser.add_argument('--mode', choices=('put', 'post', 'both'), default='both')
+    parser.add_argument('--create-tables', action='store_true', help='run db.create_all() first (implied for the scratch SQLite file)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('SECRET_KEY', 'lrs-ingest-benchmark')
+    if not os.getenv('DATABASE_URL'):
+        scratch = os.path.join(tempfile.mkdtemp(prefix='lrs_ingest_'), 'ingest.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{scratch}'
+        args.create_tables = True
+        print(f'DATABASE_URL not set, using scratch SQLite database {scratch}')
+
+    app = make_app(create_tables=args.create_tables)
+    print(f'{args.slides} bursts of {args.burst} statements, concurrency {args.concurrency}')
+    for mode in (('put', 'post') if args.mode == 'both' else (args.mode,)):
+        run(app, mode, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Rows per second for serialising LRS statements: Statement.to_dict() vs the raw passthrough.
+
+Seeds --rows statements through POST /api/lrs/statements, then measures
+  * to_dict + json.dumps (the serialisation GET /statements used before)
+  * Statement.to_json() (raw_statement passed through, LRS fields appended)
+on the same loaded rows, and the end-to-end GET /api/lrs/statements rate,
+paged and as a streamed export. The GET timings read every statement in
+the database, so point it at a scratch database; with no DATABASE_URL it
+uses a scratch SQLite file.
+
+    python -m benchmarks.lrs_serialize --rows 20000
+"""
+import argparse
+import json
+import os
+import tempfile
+import uuid
+
+from app.db import db
+from app.models import statements as statements_module
+from app.models.statements import Statement
+from benchmarks.common import Timer, make_app
+from benchmarks.lrs_ingest import cleanup, make_burst
+
+
+def rate(label, rows, elapsed):
+    print(f'{label:<36} {rows:>8} rows {elapsed:>8.3f}s {rows / elapsed if elapsed else 0:>12.0f} rows/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LRS statement serialisation benchmark')
+    parser.add_argument('--rows', type=int, default=10000, help='statements to seed and serialise')
+    parser.add_argument('--page', type=int, default=500, help='limit used for the paged GET')
+    parser.add_argument('--create-tables', action='store_true', help='run db.create_all() first (implied for the scratch SQLite file)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('SECRET_KEY', 'lrs-serialize-benchmark')
+    if not os.getenv('DATABASE_URL'):
+        scratch = os.path.join(tempfile.mkdtemp(prefix='lrs_serialize_'), 'serialize.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{scratch}'
+        args.create_tables = True
+        print(f'DATABASE_URL not set, using scratch SQLite database {scratch}')
+
+    app = make_app(create_tables=args.create_tables)
+    client = app.test_client()
+    tag = uuid.uuid4().hex[:8]
+    auth = (f'bench-{tag}', 'bench')
+    for slide in range(0, args.rows, 50):
+        client.post('/api/lrs/statements', json=make_burst(tag, slide, min(50, args.rows - slide), 20), auth=auth)
+    print(f"JSON encoder: {'orjson' if statements_module.orjson else 'json'}")
+
+    try:
+        with app.app_context():
+            rows = Statement.query.filter(Statement.authority == f'bench-{tag}').all()
+            with Timer() as t:
+                for statement in rows:
+                    json.dumps(statement.to_dict())
+            rate('to_dict + json.dumps (before)', len(rows), t.elapsed)
+            with Timer() as t:
+                for statement in rows:
+                    statement.to_json()
+            rate('to_json passthrough (after)', len(rows), t.elapsed)
+            db.session.remove()
+
+        headers = {'Accept': 'application/json'}
+        with Timer() as t:
+            url, fetched = f'/api/lrs/statements?limit={args.page}', 0
+            while url:
+                page = client.get(url, auth=auth, headers=headers).get_json()
+                fetched += len(page['statements'])
+                url = page['more']
+        rate(f'GET /statements, pages of {args.page}', fetched, t.elapsed)
+        with Timer() as t:
+            fetched = len(client.get('/api/lrs/statements?export=1', auth=auth, headers=headers).data.splitlines())
+        rate('GET /statements?export=1 (NDJSON)', fetched, t.elapsed)
+    finally:
+        with app.app_context():
+            cleanup(tag)
+
+
+if __name__ == '__main__':
+    main()
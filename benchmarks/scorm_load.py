@@ -0,0 +1,170 @@
+"""Load harness for the SCORM runtime endpoints in app/apis/lms.py.
+
+Replays SCORM API call traces (benchmarks/traces/*.json) for N concurrent
+learners through the Flask test client and reports per-endpoint latency
+percentiles, database commits per second and row growth. Nothing leaves the
+process, so it runs offline; with no DATABASE_URL it uses a scratch SQLite
+file.
+
+    python -m benchmarks.scorm_load --learners 200 --concurrency 32
+    python -m benchmarks.scorm_load --mode direct --trace benchmarks/traces/captivate_scorm12.json
+    DATABASE_URL=postgresql://localhost/esaksham_bench python -m benchmarks.scorm_load --learners 2000
+
+--mode shim (default) behaves like the player in lms/player.html: GetValue is
+answered from the initialize snapshot and SetValue is buffered until
+LMSCommit/LMSFinish. --mode direct sends every call to the server, as the
+player did before buffering.
+
+A trace is {"name", "description", "calls": [[api_call, *args], ...]}; "{n}"
+in a value is replaced by the learner's session number so resumes write new
+data.
+"""
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import json
+import os
+import tempfile
+import threading
+
+from sqlalchemy import event
+
+from app.db import db
+from benchmarks.common import Timer, cleanup_learners, make_app, seed_learners, summarise
+
+TRACE_DIR = os.path.join(os.path.dirname(__file__), 'traces')
+COUNTED_TABLES = ('scorm_data', 'scorm_documents', 'scorm_attempts', 'completion_events')
+
+
+class Learner:
+    """Drives one learner's calls through a test client, like the player shim would."""
+
+    def __init__(self, client, course_id, mode, record):
+        self.client = client
+        self.base = f'/api/lms/scorm/{course_id}'
+        self.mode = mode
+        self.record = record
+        self.cmi = {}
+        self.pending = {}
+        self.attempt = None
+
+    def post(self, endpoint, body=None):
+        # Echo the attempt token like the player does, so any worker can adopt the attempt
+        with Timer() as t:
+            response = self.client.post(f'{self.base}/{endpoint}', json=dict(body or {}, attempt=self.attempt))
+        payload = response.get_json(silent=True) or {}
+        # get_value answers 101 for elements that were never set; that is not a failure
+        failed = response.status_code != 200 or (endpoint != 'get_value' and payload.get('errorCode', '0') != '0')
+        self.record(endpoint, t.elapsed, failed)
+        return payload
+
+    def play(self, calls, session_no):
+        for call, *args in calls:
+            args = [arg.replace('{n}', str(session_no)) for arg in args]
+            getattr(self, call)(*args)
+
+    def LMSInitialize(self):
+        payload = self.post('initialize')
+        self.cmi = payload.get('data') or {}
+        self.attempt = payload.get('attempt')
+
+    def LMSGetValue(self, element):
+        if self.mode == 'direct':
+            self.post('get_value', {'element': element})
+
+    def LMSSetValue(self, element, value):
+        if self.mode == 'direct':
+            self.post('set_value', {'element': element, 'value': value})
+        elif self.cmi.get(element) != value:
+            self.cmi[element] = value
+            self.pending[element] = value
+
+    def LMSCommit(self):
+        self.post('commit', {'values': self.pending} if self.mode == 'shim' else {})
+        self.pending = {}
+
+    def LMSFinish(self):
+        self.post('finish', {'values': self.pending} if self.mode == 'shim' else {})
+        self.pending = {}
+        self.attempt = None
+
+
+def count_rows():
+    counts = {}
+    for table in COUNTED_TABLES:
+        try:
+            counts[table] = db.session.execute(db.text(f'SELECT COUNT(*) FROM {table}')).scalar()
+        except Exception:
+            db.session.rollback()
+            counts[table] = None
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SCORM runtime load harness')
+    parser.add_argument('--learners', type=int, default=100, help='number of simulated learners')
+    parser.add_argument('--concurrency', type=int, default=16, help='learners running at the same time')
+    parser.add_argument('--sessions', type=int, default=2, help='times each learner plays the trace (resumes)')
+    parser.add_argument('--trace', action='append', help='trace file(s); default: all of benchmarks/traces')
+    parser.add_argument('--mode', choices=('shim', 'direct'), default='shim')
+    parser.add_argument('--create-tables', action='store_true', help='run db.create_all() first (implied for the scratch SQLite file)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('SECRET_KEY', 'scorm-load-harness')
+    if not os.getenv('DATABASE_URL'):
+        scratch = os.path.join(tempfile.mkdtemp(prefix='scorm_load_'), 'load.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{scratch}'
+        args.create_tables = True
+        print(f'DATABASE_URL not set, using scratch SQLite database {scratch}')
+
+    traces = [json.load(open(path)) for path in (args.trace or sorted(glob.glob(os.path.join(TRACE_DIR, '*.json'))))]
+    app = make_app(create_tables=args.create_tables)
+
+    with app.app_context():
+        course_id, user_ids = seed_learners(args.learners)
+        rows_before = count_rows()
+        commits = [0]
+        event.listen(db.engine, 'commit', lambda conn: commits.__setitem__(0, commits[0] + 1))
+
+    latencies, errors, lock = defaultdict(list), defaultdict(int), threading.Lock()
+
+    def record(endpoint, elapsed, failed):
+        with lock:
+            latencies[endpoint].append(elapsed)
+            errors[endpoint] += failed
+
+    def run_learner(index):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_ids[index])
+            session['_fresh'] = True
+        learner = Learner(client, course_id, args.mode, record)
+        trace = traces[index % len(traces)]
+        for session_no in range(args.sessions):
+            learner.play(trace['calls'], session_no)
+
+    print(f"{args.learners} learners x {args.sessions} sessions, concurrency {args.concurrency}, mode {args.mode}, "
+          f"traces: {', '.join(t['name'] for t in traces)}")
+    with Timer() as total:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for future in [pool.submit(run_learner, i) for i in range(args.learners)]:
+                future.result()
+
+    all_latencies = [sample for samples in latencies.values() for sample in samples]
+    for endpoint in sorted(latencies):
+        summarise(endpoint, latencies[endpoint], total.elapsed, errors[endpoint])
+    summarise('all requests', all_latencies, total.elapsed, sum(errors.values()))
+    print(f'elapsed {total.elapsed:.1f}s, {commits[0]} DB commits ({commits[0] / total.elapsed:.1f}/s)')
+
+    with app.app_context():
+        rows_after = count_rows()
+        for table in COUNTED_TABLES:
+            if rows_before[table] is not None:
+                growth = rows_after[table] - rows_before[table]
+                print(f'{table:<20} +{growth} rows ({growth / args.learners:.1f} per learner)')
+        cleanup_learners(course_id, user_ids)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Compare ScormData.upsert_many with the old select-then-write path under concurrent load.
+
+Each thread plays a learner that keeps re-writing the same CMI keys, and
+pairs of threads share a learner so that writes to the same key race the
+way two tabs or a retried request do.
+
+    python -m benchmarks.scorm_upsert --threads 8 --iterations 200 --keys 5
+"""
+import argparse
+import threading
+
+from app.db import db
+from app.models import ScormData
+from benchmarks.common import Timer, cleanup_learners, make_app, seed_learners, summarise
+
+
+def select_then_write(user_id, course_id, values):
+    """The pre-upsert scorm_set_value path: one SELECT and one commit per key."""
+    for key, value in values.items():
+        row = ScormData.get_by_key(user_id, course_id, key)
+        if row:
+            row.update(cmi_value=value)
+        else:
+            ScormData(user_id=user_id, course_id=course_id, cmi_key=key, cmi_value=value).save()
+
+
+def upsert(user_id, course_id, values):
+    ScormData.upsert_many(user_id, course_id, values)
+    db.session.commit()
+
+
+def run(app, writer, args, course_id, user_ids):
+    latencies, errors, lock = [], [0], threading.Lock()
+
+    def worker(thread_no):
+        user_id = user_ids[thread_no // 2]
+        local, failed = [], 0
+        with app.app_context():
+            for i in range(args.iterations):
+                values = {f"cmi.bench.key_{k}": f"{thread_no}-{i}" for k in range(args.keys)}
+                with Timer() as t:
+                    try:
+                        writer(user_id, course_id, values)
+                    except Exception:
+                        db.session.rollback()
+                        failed += 1
+                local.append(t.elapsed)
+            db.session.remove()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    with Timer() as total:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return latencies, total.elapsed, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--keys", type=int, default=5, help="CMI keys written per call")
+    parser.add_argument("--create-tables", action="store_true", help="run db.create_all() first (scratch databases only)")
+    args = parser.parse_args()
+
+    app = make_app(create_tables=args.create_tables)
+    for name, writer in (("select-then-write", select_then_write), ("upsert_many", upsert)):
+        with app.app_context():
+            course_id, user_ids = seed_learners((args.threads + 1) // 2)
+        latencies, elapsed, errors = run(app, writer, args, course_id, user_ids)
+        summarise(name, latencies, elapsed, errors)
+        with app.app_context():
+            cleanup_learners(course_id, user_ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""add activity_states table for the xAPI State API
+
+Revision ID: 1b3d5f7a9c24
+Revises: f3a5c7e9b126
+Create Date: 2026-10-18 16:05:12.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b3d5f7a9c24'
+down_revision = 'f3a5c7e9b126'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('activity_states',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('agent', sa.String(length=512), nullable=False),
+    sa.Column('activity_id', sa.String(length=255), nullable=False),
+    sa.Column('registration', sa.String(length=36), nullable=False),
+    sa.Column('state_id', sa.String(length=255), nullable=False),
+    sa.Column('content_type', sa.String(length=255), nullable=False),
+    sa.Column('document', sa.LargeBinary(), nullable=False),
+    sa.Column('etag', sa.String(length=40), nullable=False),
+    sa.Column('updated', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('agent', 'activity_id', 'registration', 'state_id', name='uq_activity_states_key')
+    )
+
+
+def downgrade():
+    op.drop_table('activity_states')
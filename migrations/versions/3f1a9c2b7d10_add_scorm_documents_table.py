@@ -0,0 +1,34 @@
+"""add scorm_documents table for document-per-attempt CMI storage
+
+Revision ID: 3f1a9c2b7d10
+Revises: 
+Create Date: 2026-10-18 10:12:41.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '3f1a9c2b7d10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scorm_documents',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'{}'::jsonb"), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'course_id')
+    )
+    # Existing scorm_data rows are converted separately, in batches:
+    #   flask scorm backfill-documents
+
+
+def downgrade():
+    op.drop_table('scorm_documents')
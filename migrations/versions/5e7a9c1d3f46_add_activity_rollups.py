@@ -0,0 +1,61 @@
+"""add activity rollup tables and their watermark
+
+The rollups start empty; the background worker (or `flask lrs rollup`)
+fills them from existing statements.
+
+Revision ID: 5e7a9c1d3f46
+Revises: 1b3d5f7a9c24
+Create Date: 2026-10-18 16:48:27.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e7a9c1d3f46'
+down_revision = '1b3d5f7a9c24'
+branch_labels = None
+depends_on = None
+
+
+def _rollup_columns():
+    return [
+        sa.Column('statements', sa.Integer(), nullable=False),
+        sa.Column('attempted', sa.Integer(), nullable=False),
+        sa.Column('completed', sa.Integer(), nullable=False),
+        sa.Column('passed', sa.Integer(), nullable=False),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('best_scaled', sa.Float(), nullable=True),
+        sa.Column('last_scaled', sa.Float(), nullable=True),
+        sa.Column('last_scored_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('first_timestamp', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_timestamp', sa.DateTime(timezone=True), nullable=True),
+    ]
+
+
+def upgrade():
+    op.create_table('activity_rollups',
+    sa.Column('activity_id', sa.String(length=255), nullable=False),
+    sa.Column('learners', sa.Integer(), nullable=False),
+    *_rollup_columns(),
+    sa.PrimaryKeyConstraint('activity_id')
+    )
+    op.create_table('activity_agent_rollups',
+    sa.Column('activity_id', sa.String(length=255), nullable=False),
+    sa.Column('agent', sa.String(length=255), nullable=False),
+    *_rollup_columns(),
+    sa.PrimaryKeyConstraint('activity_id', 'agent')
+    )
+    op.create_table('rollup_watermarks',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('stored', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('statement_id', sa.String(length=36), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('rollup_watermarks')
+    op.drop_table('activity_agent_rollups')
+    op.drop_table('activity_rollups')
@@ -0,0 +1,155 @@
+"""statements reference verbs, activities and agents by integer key
+
+Adds the verbs table and an integer primary key (`key`) on activities;
+the activity IRI in activities.id stays unique. Every verb, activity and
+agent that existing statements mention is added to its table, then
+statements.actor_mbox, actor_name, verb_id, verb_display and object_id are
+replaced by actor_key, verb_key and object_key.
+
+The statements UPDATE rewrites every row. On PostgreSQL run VACUUM FULL
+(or pg_repack) on the statement partitions afterwards to get the space
+back, and `flask lrs reconcile-counters` to count the agents and
+activities added here.
+
+Revision ID: 7a9c1e3b5d68
+Revises: 5e7a9c1d3f46
+Create Date: 2026-10-18 17:32:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a9c1e3b5d68'
+down_revision = '5e7a9c1d3f46'
+branch_labels = None
+depends_on = None
+
+STRING_INDEXES = [
+    ('idx_statements_live_actor', ['actor_mbox', 'stored', 'id']),
+    ('idx_statements_live_verb', ['verb_id', 'stored', 'id']),
+    ('idx_statements_live_object', ['object_id', 'stored', 'id']),
+]
+KEY_INDEXES = [
+    ('idx_statements_live_actor', ['actor_key', 'stored', 'id']),
+    ('idx_statements_live_verb', ['verb_key', 'stored', 'id']),
+    ('idx_statements_live_object', ['object_key', 'stored', 'id']),
+]
+
+
+def _create_indexes(indexes):
+    for name, columns in indexes:
+        op.create_index(name, 'statements', columns, unique=False, postgresql_where=sa.text('voided = false'))
+
+
+def upgrade():
+    is_postgresql = op.get_bind().dialect.name == 'postgresql'
+    op.create_table('verbs',
+    sa.Column('key', sa.Integer(), nullable=False),
+    sa.Column('id', sa.String(length=255), nullable=False),
+    sa.Column('display', sa.String(length=255), nullable=True),
+    sa.PrimaryKeyConstraint('key'),
+    sa.UniqueConstraint('id')
+    )
+
+    # activities: integer primary key, the IRI stays unique
+    if is_postgresql:
+        op.execute("ALTER TABLE activities DROP CONSTRAINT activities_pkey")
+        op.execute("ALTER TABLE activities ADD COLUMN key serial PRIMARY KEY")
+        op.execute("ALTER TABLE activities ADD CONSTRAINT activities_id_key UNIQUE (id)")
+    else:
+        op.execute("ALTER TABLE activities RENAME TO activities_old")
+        op.execute("""
+            CREATE TABLE activities (
+                key INTEGER NOT NULL PRIMARY KEY, id VARCHAR(255) NOT NULL UNIQUE, name VARCHAR(255),
+                description TEXT, type VARCHAR(255), created_at DATETIME
+            )
+        """)
+        op.execute("INSERT INTO activities (id, name, description, type, created_at) "
+                   "SELECT id, name, description, type, created_at FROM activities_old")
+        op.execute("DROP TABLE activities_old")
+
+    op.execute("INSERT INTO verbs (id, display) SELECT verb_id, MAX(verb_display) FROM statements GROUP BY verb_id")
+    op.execute("""
+        INSERT INTO activities (id)
+        SELECT DISTINCT object_id FROM statements
+        WHERE NOT EXISTS (SELECT 1 FROM activities a WHERE a.id = statements.object_id)
+    """)
+    op.execute("""
+        INSERT INTO agents (mbox, name)
+        SELECT actor_mbox, MAX(actor_name) FROM statements
+        WHERE actor_mbox IS NOT NULL AND NOT EXISTS (SELECT 1 FROM agents a WHERE a.mbox = statements.actor_mbox)
+        GROUP BY actor_mbox
+    """)
+
+    with op.batch_alter_table('statements', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('actor_key', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('verb_key', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('object_key', sa.Integer(), nullable=True))
+    op.execute("""
+        UPDATE statements SET
+            actor_key = (SELECT a.id FROM agents a WHERE a.mbox = statements.actor_mbox),
+            verb_key = (SELECT v.key FROM verbs v WHERE v.id = statements.verb_id),
+            object_key = (SELECT a.key FROM activities a WHERE a.id = statements.object_id)
+    """)
+
+    for name, _ in STRING_INDEXES:
+        op.drop_index(name, table_name='statements')
+    with op.batch_alter_table('statements', schema=None) as batch_op:
+        batch_op.alter_column('verb_key', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('object_key', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('statements_actor_key_fkey', 'agents', ['actor_key'], ['id'])
+        batch_op.create_foreign_key('statements_verb_key_fkey', 'verbs', ['verb_key'], ['key'])
+        batch_op.create_foreign_key('statements_object_key_fkey', 'activities', ['object_key'], ['key'])
+        for column in ('actor_mbox', 'actor_name', 'verb_id', 'verb_display', 'object_id'):
+            batch_op.drop_column(column)
+    _create_indexes(KEY_INDEXES)
+
+
+def downgrade():
+    is_postgresql = op.get_bind().dialect.name == 'postgresql'
+    with op.batch_alter_table('statements', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('actor_mbox', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('actor_name', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('verb_id', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('verb_display', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('object_id', sa.String(length=255), nullable=True))
+    op.execute("""
+        UPDATE statements SET
+            actor_mbox = (SELECT a.mbox FROM agents a WHERE a.id = statements.actor_key),
+            actor_name = (SELECT a.name FROM agents a WHERE a.id = statements.actor_key),
+            verb_id = (SELECT v.id FROM verbs v WHERE v.key = statements.verb_key),
+            verb_display = (SELECT v.display FROM verbs v WHERE v.key = statements.verb_key),
+            object_id = (SELECT a.id FROM activities a WHERE a.key = statements.object_key)
+    """)
+
+    for name, _ in KEY_INDEXES:
+        op.drop_index(name, table_name='statements')
+    with op.batch_alter_table('statements', schema=None) as batch_op:
+        batch_op.alter_column('verb_id', existing_type=sa.String(length=255), nullable=False)
+        batch_op.alter_column('object_id', existing_type=sa.String(length=255), nullable=False)
+        batch_op.drop_constraint('statements_actor_key_fkey', type_='foreignkey')
+        batch_op.drop_constraint('statements_verb_key_fkey', type_='foreignkey')
+        batch_op.drop_constraint('statements_object_key_fkey', type_='foreignkey')
+        for column in ('actor_key', 'verb_key', 'object_key'):
+            batch_op.drop_column(column)
+    _create_indexes(STRING_INDEXES)
+
+    if is_postgresql:
+        op.execute("ALTER TABLE activities DROP CONSTRAINT activities_id_key")
+        op.execute("ALTER TABLE activities DROP COLUMN key")
+        op.execute("ALTER TABLE activities ADD PRIMARY KEY (id)")
+    else:
+        op.execute("ALTER TABLE activities RENAME TO activities_old")
+        op.execute("""
+            CREATE TABLE activities (
+                id VARCHAR(255) NOT NULL PRIMARY KEY, name VARCHAR(255), description TEXT,
+                type VARCHAR(255), created_at DATETIME
+            )
+        """)
+        op.execute("INSERT INTO activities (id, name, description, type, created_at) "
+                   "SELECT id, name, description, type, created_at FROM activities_old")
+        op.execute("DROP TABLE activities_old")
+
+    op.drop_table('verbs')
@@ -0,0 +1,41 @@
+"""add scorm_attempts table for the shared SCORM attempt registry
+
+Revision ID: 8b2e4d6f1a35
+Revises: 3f1a9c2b7d10
+Create Date: 2026-10-18 11:02:17.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d6f1a35'
+down_revision = '3f1a9c2b7d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scorm_attempts',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('token', sa.String(length=80), nullable=False),
+    sa.Column('active', sa.Boolean(), nullable=False),
+    sa.Column('dirty', sa.Boolean(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('last_seen_at', sa.DateTime(), nullable=True),
+    sa.Column('last_commit_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'course_id')
+    )
+    with op.batch_alter_table('scorm_attempts', schema=None) as batch_op:
+        batch_op.create_index('idx_scorm_attempts_active_seen', ['active', 'last_seen_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('scorm_attempts', schema=None) as batch_op:
+        batch_op.drop_index('idx_scorm_attempts_active_seen')
+
+    op.drop_table('scorm_attempts')
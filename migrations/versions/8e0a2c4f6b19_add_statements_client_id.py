@@ -0,0 +1,48 @@
+"""add statements.client_id: the statement id the client sent, if any
+
+raw_statement no longer carries the id, so `flask lrs dedup` groups
+duplicates by (raw_statement, client_id) instead: statements the client
+sent with distinct ids stay apart, and retries of one statement (same
+body, same client id or none) collapse.
+
+Existing rows take the id from their raw document. Before statementId
+and the body id were honoured, statements.id was a fresh uuid4 even when
+the client sent an id, so statements.id cannot stand in for it there.
+
+Runs before 9c1e3b5d7f80, which strips the id from the raw documents.
+
+Revision ID: 8e0a2c4f6b19
+Revises: 7a9c1e3b5d68
+Create Date: 2026-10-18 18:05:37.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e0a2c4f6b19'
+down_revision = '7a9c1e3b5d68'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('statements', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('client_id', sa.String(length=255), nullable=True))
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            UPDATE statements SET client_id = left(raw_statement::jsonb ->> 'id', 255)
+            WHERE raw_statement::jsonb ? 'id'
+        """)
+    else:
+        op.execute("""
+            UPDATE statements SET client_id = substr(json_extract(raw_statement, '$.id'), 1, 255)
+            WHERE CASE WHEN json_valid(raw_statement) THEN json_type(raw_statement, '$.id') IS NOT NULL ELSE 0 END
+        """)
+
+
+def downgrade():
+    with op.batch_alter_table('statements', schema=None) as batch_op:
+        batch_op.drop_column('client_id')
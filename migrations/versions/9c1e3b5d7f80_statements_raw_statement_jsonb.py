@@ -0,0 +1,57 @@
+"""store statements.raw_statement as JSONB with a GIN (jsonb_path_ops) index
+
+Also strips id, stored and authority from the raw documents of older
+rows: Statement.to_json() adds the LRS values itself and would otherwise
+emit those keys twice.
+
+The type change is PostgreSQL only; elsewhere raw_statement stays TEXT
+and the keys are stripped in batches. Changing the type rewrites every
+partition under an exclusive lock, so ingestion stops for the duration:
+run it in a maintenance window (or archive old partitions first). The
+downgrade does not put the stripped keys back.
+
+Revision ID: 9c1e3b5d7f80
+Revises: 8e0a2c4f6b19
+Create Date: 2026-10-18 18:20:44.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c1e3b5d7f80'
+down_revision = '8e0a2c4f6b19'
+branch_labels = None
+depends_on = None
+
+# Rows rewritten per UPDATE on SQLite
+BATCH_SIZE = 5000
+
+
+def _strip_lrs_fields_sqlite(bind):
+    last = bind.execute(sa.text("SELECT max(rowid) FROM statements")).scalar() or 0
+    for start in range(0, last, BATCH_SIZE):
+        bind.execute(sa.text(
+            "UPDATE statements SET raw_statement = json_remove(raw_statement, '$.id', '$.stored', '$.authority') "
+            "WHERE rowid > :start AND rowid <= :end AND json_valid(raw_statement)"
+        ), {'start': start, 'end': start + BATCH_SIZE})
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        _strip_lrs_fields_sqlite(bind)
+        return
+    op.execute("ALTER TABLE statements ALTER COLUMN raw_statement TYPE jsonb "
+               "USING (raw_statement::jsonb - 'id' - 'stored' - 'authority')")
+    op.create_index('idx_statements_live_raw', 'statements', ['raw_statement'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'raw_statement': 'jsonb_path_ops'},
+                    postgresql_where=sa.text('voided = false'))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('idx_statements_live_raw', table_name='statements')
+    op.execute("ALTER TABLE statements ALTER COLUMN raw_statement TYPE text USING raw_statement::text")
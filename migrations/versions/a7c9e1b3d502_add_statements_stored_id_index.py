@@ -0,0 +1,26 @@
+"""add (stored, id) index on statements for keyset pagination
+
+Revision ID: a7c9e1b3d502
+Revises: e1f3a5c7d920
+Create Date: 2026-10-18 13:05:48.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c9e1b3d502'
+down_revision = 'e1f3a5c7d920'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('statements', schema=None) as batch_op:
+        batch_op.create_index('idx_statements_stored_id', ['stored', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('statements', schema=None) as batch_op:
+        batch_op.drop_index('idx_statements_stored_id')
@@ -0,0 +1,54 @@
+"""add statement_count and prefix search indexes to activities and agents
+
+statement_count is seeded from the activity rollups, as of their
+watermark; the rollup worker keeps it current from there.
+
+Revision ID: b2d4f6a8c091
+Revises: 9c1e3b5d7f80
+Create Date: 2026-10-18 19:02:16.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a8c091'
+down_revision = '9c1e3b5d7f80'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('statement_count', sa.BigInteger(), server_default='0', nullable=False))
+    with op.batch_alter_table('agents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('statement_count', sa.BigInteger(), server_default='0', nullable=False))
+
+    op.execute("""
+        UPDATE activities SET statement_count = r.statements
+        FROM activity_rollups r WHERE r.activity_id = activities.id
+    """)
+    op.execute("""
+        UPDATE agents SET statement_count = r.statements
+        FROM (SELECT agent, SUM(statements) AS statements FROM activity_agent_rollups GROUP BY agent) r
+        WHERE r.agent = agents.mbox
+    """)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE INDEX idx_activities_name_prefix ON activities (lower(name) text_pattern_ops)")
+        op.execute("CREATE INDEX idx_activities_id_prefix ON activities (id text_pattern_ops)")
+        op.execute("CREATE INDEX idx_agents_name_prefix ON agents (lower(name) text_pattern_ops)")
+        op.execute("CREATE INDEX idx_agents_mbox_prefix ON agents (mbox text_pattern_ops)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for name in ('idx_agents_mbox_prefix', 'idx_agents_name_prefix', 'idx_activities_id_prefix',
+                     'idx_activities_name_prefix'):
+            op.execute(f"DROP INDEX {name}")
+
+    with op.batch_alter_table('agents', schema=None) as batch_op:
+        batch_op.drop_column('statement_count')
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.drop_column('statement_count')
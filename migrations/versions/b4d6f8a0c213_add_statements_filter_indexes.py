@@ -0,0 +1,44 @@
+"""add partial indexes on statements for the GET /statements filters
+
+Replaces idx_statements_stored_id with partial (voided = false) indexes for
+each filter GET /statements supports. Built CONCURRENTLY, so the upgrade
+does not block statement ingestion.
+
+Revision ID: b4d6f8a0c213
+Revises: a7c9e1b3d502
+Create Date: 2026-10-18 13:41:09.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d6f8a0c213'
+down_revision = 'a7c9e1b3d502'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('idx_statements_live_stored', ['stored', 'id']),
+    ('idx_statements_live_actor', ['actor_mbox', 'stored', 'id']),
+    ('idx_statements_live_verb', ['verb_id', 'stored', 'id']),
+    ('idx_statements_live_object', ['object_id', 'stored', 'id']),
+    ('idx_statements_live_timestamp', ['timestamp']),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'statements', columns, unique=False, postgresql_concurrently=True,
+                            postgresql_where=sa.text('voided = false'))
+        op.drop_index('idx_statements_stored_id', table_name='statements', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('idx_statements_stored_id', 'statements', ['stored', 'id'], unique=False,
+                        postgresql_concurrently=True)
+        for name, _ in INDEXES:
+            op.drop_index(name, table_name='statements', postgresql_concurrently=True)
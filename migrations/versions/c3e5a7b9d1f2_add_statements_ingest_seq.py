@@ -0,0 +1,65 @@
+"""add statements.ingest_seq, the rollup worker's database-assigned position
+
+The activity rollups used to follow (stored, id) with a wall-clock lag and
+missed statements that committed later than the lag. ingest_seq is set by
+the database instead: on PostgreSQL (13+) it defaults to the inserting
+transaction's id, on SQLite a trigger numbers rows in insert order.
+
+Existing rows get 0 without a table rewrite. Rows the rollups have not
+folded in yet (past the old (stored, id) watermark) are set to 1, and the
+watermark moves to (0, the highest id at 0), so nothing is counted twice
+or skipped.
+
+Revision ID: c3e5a7b9d1f2
+Revises: b2d4f6a8c091
+Create Date: 2026-10-18 21:40:12.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b9d1f2'
+down_revision = 'b2d4f6a8c091'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    op.add_column('statements', sa.Column('ingest_seq', sa.BigInteger(), server_default='0', nullable=False))
+    with op.batch_alter_table('rollup_watermarks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ingest_seq', sa.BigInteger(), nullable=True))
+
+    watermark = bind.execute(sa.text(
+        "SELECT stored, statement_id FROM rollup_watermarks WHERE name = 'activity_rollups'"
+    )).first()
+    if watermark is not None and watermark.stored is not None:
+        bind.execute(sa.text("UPDATE statements SET ingest_seq = 1 WHERE (stored, id) > (:stored, :statement_id)"),
+                     {'stored': watermark.stored, 'statement_id': watermark.statement_id})
+        op.execute("""
+            UPDATE rollup_watermarks SET ingest_seq = 0,
+                statement_id = (SELECT max(id) FROM statements WHERE ingest_seq = 0)
+            WHERE name = 'activity_rollups'
+        """)
+
+    op.create_index('idx_statements_ingest_seq', 'statements', ['ingest_seq', 'id'], unique=False)
+    if bind.dialect.name == 'postgresql':
+        op.execute("ALTER TABLE statements ALTER COLUMN ingest_seq SET DEFAULT (pg_current_xact_id()::text::bigint)")
+    else:
+        op.execute("""
+            CREATE TRIGGER statements_ingest_seq AFTER INSERT ON statements BEGIN
+                UPDATE statements SET ingest_seq = (SELECT max(ingest_seq) FROM statements) + 1 WHERE rowid = NEW.rowid;
+            END
+        """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        op.execute("DROP TRIGGER statements_ingest_seq")
+    op.drop_index('idx_statements_ingest_seq', table_name='statements')
+    with op.batch_alter_table('statements', schema=None) as batch_op:
+        batch_op.drop_column('ingest_seq')
+    with op.batch_alter_table('rollup_watermarks', schema=None) as batch_op:
+        batch_op.drop_column('ingest_seq')
@@ -0,0 +1,48 @@
+"""add completion_events queue and courses.xapi_activity_id
+
+Revision ID: c5d7e9a1b342
+Revises: 8b2e4d6f1a35
+Create Date: 2026-10-18 11:48:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d7e9a1b342'
+down_revision = '8b2e4d6f1a35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('completion_events',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('source', sa.String(length=10), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('course_id', sa.Integer(), nullable=True),
+    sa.Column('actor_mbox', sa.String(length=255), nullable=True),
+    sa.Column('activity_id', sa.String(length=255), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('completion_events', schema=None) as batch_op:
+        batch_op.create_index('idx_completion_events_pending', ['id'], unique=False, postgresql_where=sa.text('processed_at IS NULL'))
+
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('xapi_activity_id', sa.String(length=255), nullable=True))
+        batch_op.create_index(batch_op.f('ix_courses_xapi_activity_id'), ['xapi_activity_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_courses_xapi_activity_id'))
+        batch_op.drop_column('xapi_activity_id')
+
+    with op.batch_alter_table('completion_events', schema=None) as batch_op:
+        batch_op.drop_index('idx_completion_events_pending')
+
+    op.drop_table('completion_events')
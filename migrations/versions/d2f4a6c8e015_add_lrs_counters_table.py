@@ -0,0 +1,37 @@
+"""add lrs_counters table for the LRS dashboard totals
+
+Seeds the counters with the current counts (shard 0).
+
+Revision ID: d2f4a6c8e015
+Revises: b4d6f8a0c213
+Create Date: 2026-10-18 14:22:51.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f4a6c8e015'
+down_revision = 'b4d6f8a0c213'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('lrs_counters',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('shard', sa.SmallInteger(), autoincrement=False, nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name', 'shard')
+    )
+    op.execute("""
+        INSERT INTO lrs_counters (name, shard, value)
+        SELECT 'statements', 0, COUNT(*) FROM statements WHERE voided = false
+        UNION ALL SELECT 'activities', 0, COUNT(*) FROM activities
+        UNION ALL SELECT 'agents', 0, COUNT(*) FROM agents
+    """)
+
+
+def downgrade():
+    op.drop_table('lrs_counters')
@@ -0,0 +1,26 @@
+"""add courses.prefetch_resume opt-in flag
+
+Revision ID: e1f3a5c7d920
+Revises: c5d7e9a1b342
+Create Date: 2026-10-18 12:21:36.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f3a5c7d920'
+down_revision = 'c5d7e9a1b342'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('prefetch_resume', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('courses', schema=None) as batch_op:
+        batch_op.drop_column('prefetch_resume')
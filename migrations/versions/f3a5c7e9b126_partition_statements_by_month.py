@@ -0,0 +1,109 @@
+"""partition statements by month on stored, with a statement_ids claim table
+
+PostgreSQL only; on other databases only statement_ids is created.
+
+The existing table is not rewritten. It is renamed to statements_legacy
+and attached as the partition for everything stored before the first day
+of the month after its newest row (or after the current month, if that
+is later), so rows already stored this month stay inside its bound.
+Monthly partitions start at that date; until then new statements also go
+to statements_legacy. Attaching still builds the partitioned indexes on
+statements_legacy and checks its rows against the bound, so run this in
+a quiet window on a large table.
+
+A partitioned primary key must include the partition key, so it becomes
+(id, stored). statement_ids keeps ids unique across partitions; it is
+backfilled from the existing rows.
+
+Revision ID: f3a5c7e9b126
+Revises: d2f4a6c8e015
+Create Date: 2026-10-18 15:10:33.000000
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a5c7e9b126'
+down_revision = 'd2f4a6c8e015'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+INDEXES = [
+    ('idx_statements_live_stored', 'stored, id'),
+    ('idx_statements_live_actor', 'actor_mbox, stored, id'),
+    ('idx_statements_live_verb', 'verb_id, stored, id'),
+    ('idx_statements_live_object', 'object_id, stored, id'),
+]
+
+
+def _next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def upgrade():
+    op.create_table('statement_ids',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('stored', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('statement_ids', schema=None) as batch_op:
+        batch_op.create_index('idx_statement_ids_stored', ['stored'], unique=False)
+
+    op.execute("UPDATE statements SET stored = COALESCE(timestamp, CURRENT_TIMESTAMP) WHERE stored IS NULL")
+    op.execute("INSERT INTO statement_ids (id, stored) SELECT id, stored FROM statements")
+    if op.get_bind().dialect.name != 'postgresql':
+        with op.batch_alter_table('statements', schema=None) as batch_op:
+            batch_op.alter_column('stored', existing_type=sa.DateTime(timezone=True), nullable=False)
+            batch_op.drop_index('idx_statements_live_timestamp')
+        return
+
+    latest = op.get_bind().execute(sa.text("SELECT max(stored) FROM statements")).scalar()
+    now = datetime.now(timezone.utc)
+    month = _next_month(max(latest.astimezone(timezone.utc), now) if latest else now)
+    op.execute("ALTER TABLE statements ALTER COLUMN stored SET NOT NULL")
+    op.execute("DROP INDEX idx_statements_live_timestamp")
+    for name, _ in INDEXES:
+        op.execute(f"DROP INDEX {name}")
+    op.execute("ALTER TABLE statements RENAME TO statements_legacy")
+    op.execute("ALTER TABLE statements_legacy DROP CONSTRAINT statements_pkey")
+
+    op.execute("CREATE TABLE statements (LIKE statements_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (stored)")
+    op.execute("ALTER TABLE statements ADD CONSTRAINT statements_pkey PRIMARY KEY (id, stored)")
+    for name, columns in INDEXES:
+        op.execute(f"CREATE INDEX {name} ON statements ({columns}) WHERE voided = false")
+    op.execute(f"ALTER TABLE statements ATTACH PARTITION statements_legacy "
+               f"FOR VALUES FROM (MINVALUE) TO ('{month.isoformat()}')")
+    for _ in range(MONTHS_AHEAD + 1):
+        op.execute(f"CREATE TABLE statements_{month:%Y_%m} PARTITION OF statements "
+                   f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')")
+        month = _next_month(month)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # Copy everything back into a plain table
+        op.execute("ALTER TABLE statements RENAME TO statements_partitioned")
+        op.execute("ALTER TABLE statements_partitioned RENAME CONSTRAINT statements_pkey TO statements_partitioned_pkey")
+        for name, _ in INDEXES:
+            op.execute(f"ALTER INDEX {name} RENAME TO {name}_partitioned")
+        op.execute("CREATE TABLE statements (LIKE statements_partitioned INCLUDING DEFAULTS)")
+        op.execute("INSERT INTO statements SELECT * FROM statements_partitioned")
+        op.execute("DROP TABLE statements_partitioned")
+        op.execute("ALTER TABLE statements ADD CONSTRAINT statements_pkey PRIMARY KEY (id)")
+        for name, columns in INDEXES:
+            op.execute(f"CREATE INDEX {name} ON statements ({columns}) WHERE voided = false")
+        op.execute("CREATE INDEX idx_statements_live_timestamp ON statements (timestamp) WHERE voided = false")
+    else:
+        with op.batch_alter_table('statements', schema=None) as batch_op:
+            batch_op.create_index('idx_statements_live_timestamp', ['timestamp'], unique=False)
+
+    with op.batch_alter_table('statement_ids', schema=None) as batch_op:
+        batch_op.drop_index('idx_statement_ids_stored')
+
+    op.drop_table('statement_ids')
@@ -0,0 +1,43 @@
+import pytest
+
+from app import create_app
+from app.apis.lms import attempts
+from app.apis.lrs import known
+from app.db import db
+from benchmarks.common import seed_learners
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The app on a scratch SQLite database, with the per-worker caches emptied."""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('SECRET_KEY', 'test')
+    # Background workers would outlive the test's database
+    monkeypatch.setenv('LRS_ROLLUP_INTERVAL', '3600')
+    monkeypatch.setattr(attempts, '_cache', None)
+    monkeypatch.setattr(known, '_maps', {})
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def learner(client):
+    """(course_id, user_id) of a learner enrolled on a new course, logged in on `client`."""
+    course_id, (user_id,) = seed_learners(1)
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return course_id, user_id
+
+
+def scorm_call(client, course_id, endpoint, body):
+    return client.post(f'/api/lms/scorm/{course_id}/{endpoint}', json=body).get_json()
@@ -0,0 +1,45 @@
+from app.db import db
+from app.models import Statement, StatementId
+
+STATEMENT = {'actor': {'mbox': 'mailto:a@example.invalid'}, 'verb': {'id': 'http://adlnet.gov/expapi/verbs/experienced'},
+             'object': {'id': 'http://example.invalid/course'}}
+AUTH = ('lrs', 'lrs')
+
+
+def post(client, statement):
+    response = client.post('/api/lrs/statements', json=statement, auth=AUTH)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def dedup(app):
+    result = app.test_cli_runner().invoke(args=['lrs', 'dedup'])
+    assert result.exception is None, result.output
+    return result.output
+
+
+def test_dedup_merges_retries_and_keeps_distinct_client_ids(app, client):
+    retries = post(client, STATEMENT) + post(client, STATEMENT)
+    first = dict(STATEMENT, id='00000000-0000-4000-8000-000000000001')
+    second = dict(STATEMENT, id='00000000-0000-4000-8000-000000000002')
+    post(client, first)
+    post(client, second)
+
+    assert 'Deleted 1 duplicate' in dedup(app)
+    assert {row.id for row in Statement.query} == {retries[0], first['id'], second['id']}
+    assert StatementId.query.count() == 3
+
+    # The deleted copy's id is free again
+    response = client.put('/api/lrs/statements', query_string={'statementId': retries[1]}, json=STATEMENT, auth=AUTH)
+    assert response.status_code == 200
+    assert client.get(f'/api/lrs/statements/{retries[1]}', auth=AUTH).status_code == 200
+
+
+def test_dedup_merges_legacy_retries_by_their_body_id(app, client):
+    # Stored before the body id was honoured: random ids, the body id only in client_id
+    ids = post(client, STATEMENT) + post(client, STATEMENT)
+    Statement.query.update({'client_id': 'tincan-retry'}, synchronize_session=False)
+    db.session.commit()
+
+    assert 'Deleted 1 duplicate' in dedup(app)
+    assert [row.id for row in Statement.query] == [ids[0]]
@@ -0,0 +1,39 @@
+import json
+
+STATEMENT = {'actor': {'mbox': 'mailto:a@example.invalid'}, 'verb': {'id': 'http://adlnet.gov/expapi/verbs/experienced'},
+             'object': {'id': 'http://example.invalid/course'}}
+AUTH = ('lrs', 'lrs')
+
+
+def get_statement(client, statement_id):
+    response = client.get(f'/api/lrs/statements/{statement_id}', auth=AUTH)
+    assert response.status_code == 200
+    return json.loads(response.data)
+
+
+def test_statement_without_timestamp_gets_one_and_a_version(client):
+    (statement_id,) = client.post('/api/lrs/statements', json=STATEMENT, auth=AUTH).get_json()
+
+    served = get_statement(client, statement_id)
+    assert served['id'] == statement_id
+    assert served['timestamp'] and served['stored'] and served['version'] == '1.0.3'
+
+
+def test_client_timestamp_and_version_are_kept(client):
+    statement = dict(STATEMENT, timestamp='2026-01-01T00:00:00Z', version='1.0.0')
+    (statement_id,) = client.post('/api/lrs/statements', json=statement, auth=AUTH).get_json()
+
+    served = get_statement(client, statement_id)
+    assert (served['timestamp'], served['version']) == ('2026-01-01T00:00:00Z', '1.0.0')
+
+
+def test_batch_repeating_a_statement_id_is_rejected(client):
+    statement = dict(STATEMENT, id='00000000-0000-4000-8000-000000000001')
+    other = dict(STATEMENT, id='00000000-0000-4000-8000-000000000002')
+
+    response = client.post('/api/lrs/statements', json=[statement, other, statement], auth=AUTH)
+    assert response.status_code == 400
+    assert client.get(f"/api/lrs/statements/{other['id']}", auth=AUTH).status_code == 404
+
+    response = client.post('/api/lrs/statements', json=[statement, other], auth=AUTH)
+    assert response.get_json() == [statement['id'], other['id']]
@@ -0,0 +1,33 @@
+from app.apis.lms import attempts
+from app.models import ScormAttempt
+from tests.conftest import scorm_call
+
+
+def test_database_registry_round_trip(app, client, learner):
+    app.config['SCORM_ATTEMPT_REGISTRY'] = 'database'
+    course_id, user_id = learner
+
+    started = scorm_call(client, course_id, 'initialize', {})
+    assert started['errorCode'] == '0'
+    token = started['attempt']
+    assert len(token) <= ScormAttempt.token.type.length
+    assert ScormAttempt.query.filter_by(user_id=user_id, course_id=course_id).one().token == token
+
+    # Another worker only has the shared table to go by
+    attempts.cache.clear()
+    committed = scorm_call(client, course_id, 'commit', {'values': {'cmi.core.lesson_location': 'p2'}, 'attempt': token})
+    assert committed == {'result': 'true', 'errorCode': '0'}
+
+    assert scorm_call(client, course_id, 'finish', {'attempt': token})['errorCode'] == '0'
+    attempts.cache.clear()
+    assert scorm_call(client, course_id, 'commit', {'values': {}, 'attempt': token})['errorCode'] == '132'
+
+
+def test_memory_registry_needs_the_signed_token(client, learner):
+    course_id, _ = learner
+
+    token = scorm_call(client, course_id, 'initialize', {})['attempt']
+    attempts.cache.clear()
+    assert scorm_call(client, course_id, 'commit', {'values': {}})['errorCode'] == '132'
+    assert scorm_call(client, course_id, 'commit', {'values': {}, 'attempt': token + 'x'})['errorCode'] == '132'
+    assert scorm_call(client, course_id, 'commit', {'values': {}, 'attempt': token})['errorCode'] == '0'
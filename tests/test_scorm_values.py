@@ -0,0 +1,20 @@
+import pytest
+
+from app.models import CompletionEvent
+from tests.conftest import scorm_call
+
+
+@pytest.mark.parametrize('storage', ['rows', 'document'])
+def test_repeated_passed_status_queues_one_completion(app, client, learner, storage):
+    app.config['SCORM_STORAGE'] = storage
+    course_id, user_id = learner
+    token = scorm_call(client, course_id, 'initialize', {})['attempt']
+    before = client.get('/api/lms/scorm/stats').get_json()['writes']
+
+    for _ in range(3):
+        body = {'values': {'cmi.core.lesson_status': 'passed', 'cmi.core.score.raw': '90'}, 'attempt': token}
+        assert scorm_call(client, course_id, 'commit', body)['errorCode'] == '0'
+
+    assert CompletionEvent.query.filter_by(user_id=user_id, course_id=course_id).count() == 1
+    after = client.get('/api/lms/scorm/stats').get_json()['writes']
+    assert {key: after[key] - before[key] for key in after} == {'persisted': 2, 'elided': 4}